@@ -0,0 +1,87 @@
+"""On-disk cache for HTTP responses whose data does not change between runs."""
+
+import hashlib
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from config import DEFAULT_CACHE_DIR, CACHE_EXPIRE_SECONDS
+
+# Request parameters that identify the caller rather than the data
+_IGNORED_PARAMS = ("email", "tool", "api_key")
+
+
+class ResponseCache:
+    """Stores raw response bodies on disk, keyed by URL and query parameters."""
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR, expire_after: float = CACHE_EXPIRE_SECONDS):
+        """
+        Initialize response cache.
+
+        Args:
+            cache_dir: Directory holding cached responses
+            expire_after: Seconds after which a cached response is ignored
+        """
+        self.cache_dir = Path(cache_dir).expanduser()
+        self.expire_after = expire_after
+
+    def _path(self, url: str, params: Optional[Dict] = None) -> Path:
+        """
+        Map a request to its cache file.
+
+        Args:
+            url: Request URL
+            params: Query parameters
+
+        Returns:
+            Path of the cache file for this request
+        """
+        items = sorted(
+            (key, str(value)) for key, value in (params or {}).items()
+            if key not in _IGNORED_PARAMS
+        )
+        request_key = url + "?" + "&".join(f"{key}={value}" for key, value in items)
+        digest = hashlib.sha256(request_key.encode("utf-8")).hexdigest()
+        return self.cache_dir / digest[:2] / digest
+
+    def get(self, url: str, params: Optional[Dict] = None, allow_stale: bool = False) -> Optional[bytes]:
+        """
+        Look up a cached response body.
+
+        Args:
+            url: Request URL
+            params: Query parameters
+            allow_stale: Return expired content too (fallback when the network fails)
+
+        Returns:
+            Cached content, or None if missing or expired
+        """
+        path = self._path(url, params)
+        try:
+            if not allow_stale and time.time() - path.stat().st_mtime > self.expire_after:
+                return None
+            return path.read_bytes()
+        except OSError:
+            return None
+
+    def set(self, url: str, params: Optional[Dict], content: bytes) -> None:
+        """
+        Store a response body. Failures are ignored; the cache is best-effort.
+
+        Args:
+            url: Request URL
+            params: Query parameters
+            content: Response body
+        """
+        path = self._path(url, params)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # Write then rename, so readers never see a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+            with os.fdopen(fd, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
@@ -2,20 +2,77 @@
 """Command-line interface for Spatial Transcriptomics Data Miner."""
 
 import argparse
+import functools
+import io
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Dict
+from typing import Callable, List, Dict, Optional, Tuple
 
 from ncbi_fetcher import NCBIFetcher
 from tenx_fetcher import TenXFetcher
 from htan_fetcher import HTANFetcher
-from exporter import ExcelExporter
+from exporter import CatalogExporter
+from cache import ResponseCache
 from config import (
     DEFAULT_NCBI_QUERY,
     DEFAULT_MAX_RESULTS,
-    DEFAULT_OUTPUT_FILE
+    DEFAULT_OUTPUT_FILE,
+    OUTPUT_FORMATS,
+    DEFAULT_CACHE_DIR
 )
 
+# Set on Ctrl-C so fetchers stop between chunks/pages instead of finishing every request
+_stop_event = threading.Event()
+
+
+class _SourceOutput:
+    """
+    Stand-in for sys.stdout while sources are fetched concurrently.
+    
+    A source running under capture() writes into its own buffer; every other
+    thread writes straight through to the real stream.
+    """
+    
+    def __init__(self, stream):
+        self.stream = stream
+        self._local = threading.local()
+    
+    def write(self, text: str) -> int:
+        buffer = getattr(self._local, 'buffer', None)
+        return (self.stream if buffer is None else buffer).write(text)
+    
+    def flush(self) -> None:
+        if getattr(self._local, 'buffer', None) is None:
+            self.stream.flush()
+    
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+    
+    def capture(self, fetch: Callable, args) -> Tuple[List[Dict], str]:
+        """
+        Run one source fetch function with its output held back.
+        
+        Args:
+            fetch: Source fetch function
+            args: Parsed command-line arguments
+        
+        Returns:
+            (datasets, everything the source printed)
+        """
+        buffer = io.StringIO()
+        self._local.buffer = buffer
+        try:
+            datasets = fetch(args)
+        except BaseException:
+            # Don't lose the source's log when it fails; the error follows it
+            self.stream.write(buffer.getvalue())
+            raise
+        finally:
+            self._local.buffer = None
+        return datasets, buffer.getvalue()
+
 
 def print_banner():
     """Print application banner."""
@@ -28,15 +85,43 @@ def print_banner():
     print(banner)
 
 
+@functools.lru_cache(maxsize=None)
+def _get_response_cache(cache_dir: str) -> ResponseCache:
+    """Return a shared on-disk response cache per directory."""
+    return ResponseCache(cache_dir)
+
+
+def _response_cache(args) -> Optional[ResponseCache]:
+    """Return the response cache selected on the command line, if any."""
+    if args.no_cache:
+        return None
+    return _get_response_cache(args.cache_dir)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_ncbi_fetcher(email: Optional[str], cache: Optional[ResponseCache]) -> NCBIFetcher:
+    """Return a shared NCBI fetcher (and its HTTP session) per email and cache."""
+    return NCBIFetcher(email=email, cache=cache, stop_event=_stop_event)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_10x_fetcher(cache: Optional[ResponseCache]) -> TenXFetcher:
+    """Return a shared 10x Genomics fetcher (and its HTTP session) per cache."""
+    return TenXFetcher(cache=cache, stop_event=_stop_event)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_htan_fetcher(cache: Optional[ResponseCache]) -> HTANFetcher:
+    """Return a shared HTAN fetcher (and its HTTP session) per cache."""
+    return HTANFetcher(cache=cache, stop_event=_stop_event)
+
+
 def fetch_ncbi_data(args) -> List[Dict]:
     """Fetch data from NCBI GEO."""
-    if not args.include_ncbi:
-        return []
-    
     print("\n🧬 NCBI GEO")
     print("-" * 50)
     
-    fetcher = NCBIFetcher(email=args.email)
+    fetcher = _get_ncbi_fetcher(args.email, _response_cache(args))
     return fetcher.fetch_all(
         query=args.query,
         max_results=args.max_results
@@ -45,28 +130,73 @@ def fetch_ncbi_data(args) -> List[Dict]:
 
 def fetch_10x_data(args) -> List[Dict]:
     """Fetch data from 10x Genomics."""
-    if not args.include_10x:
-        return []
-    
     print("\n🧠 10x Genomics")
     print("-" * 50)
     
-    fetcher = TenXFetcher()
+    fetcher = _get_10x_fetcher(_response_cache(args))
     return fetcher.fetch_datasets()
 
 
 def fetch_htan_data(args) -> List[Dict]:
     """Fetch data from HTAN."""
-    if not args.include_htan:
-        return []
-    
     print("\n🏛️  HTAN")
     print("-" * 50)
     
-    fetcher = HTANFetcher()
+    fetcher = _get_htan_fetcher(_response_cache(args))
     return fetcher.fetch_datasets()
 
 
+# (display name, flag suffix for --only-*/--include-*, fetch function)
+SOURCES = [
+    ("NCBI GEO", "ncbi", fetch_ncbi_data),
+    ("10x Genomics", "10x", fetch_10x_data),
+    ("HTAN", "htan", fetch_htan_data),
+]
+
+
+def fetch_sources(fetch_functions: List[Callable], args) -> List[Dict]:
+    """
+    Run source fetch functions concurrently and combine their datasets.
+    
+    Sources are independent and network-bound (different hosts), so total
+    time is that of the slowest source rather than the sum. Each source's
+    output is buffered and printed as one block when that source finishes,
+    so progress and error lines stay under their own header.
+    
+    Args:
+        fetch_functions: Functions taking the parsed arguments, e.g. from SOURCES
+        args: Parsed command-line arguments
+    
+    Returns:
+        Datasets from all sources, in the order the functions were given
+    """
+    if not fetch_functions:
+        return []
+    
+    output = _SourceOutput(sys.stdout)
+    sys.stdout = output
+    # Managed by hand: a with-block would wait for every in-flight fetch on Ctrl-C
+    executor = ThreadPoolExecutor(max_workers=len(fetch_functions))
+    try:
+        futures = [executor.submit(output.capture, fetch, args) for fetch in fetch_functions]
+        for future in as_completed(futures):
+            output.stream.write(future.result()[1])
+            output.stream.flush()
+    except BaseException:
+        # Ctrl-C or a failed source: stop the other fetchers and return right away
+        _stop_event.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    finally:
+        sys.stdout = output.stream
+    executor.shutdown()
+    
+    datasets = []
+    for future in futures:
+        datasets.extend(future.result()[0])
+    return datasets
+
+
 def main():
     """Main CLI entry point."""
     parser = argparse.ArgumentParser(
@@ -88,6 +218,9 @@ Examples:
   
   # Custom output file
   python -m st_miner.cli --output my_st_catalog.xlsx
+  
+  # Flat Parquet table instead of an Excel workbook
+  python -m st_miner.cli --output-format parquet
         """
     )
     
@@ -144,6 +277,20 @@ Examples:
         help='Email for NCBI API (optional but recommended)'
     )
     
+    # Cache options
+    cache_group = parser.add_argument_group('Cache Options')
+    cache_group.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Do not read or write the on-disk response cache'
+    )
+    cache_group.add_argument(
+        '--cache-dir',
+        type=str,
+        default=DEFAULT_CACHE_DIR,
+        help=f'Directory for cached API responses (default: {DEFAULT_CACHE_DIR})'
+    )
+    
     # Output options
     output_group = parser.add_argument_group('Output Options')
     output_group.add_argument(
@@ -151,7 +298,15 @@ Examples:
         '-o',
         type=str,
         default=DEFAULT_OUTPUT_FILE,
-        help=f'Output Excel file (default: {DEFAULT_OUTPUT_FILE})'
+        help=f'Output file (default: {DEFAULT_OUTPUT_FILE})'
+    )
+    output_group.add_argument(
+        '--output-format',
+        type=str,
+        choices=OUTPUT_FORMATS,
+        default=None,
+        help='Output format (default: inferred from --output suffix, otherwise xlsx). '
+             'csv/parquet/feather write a single flat table and are much faster than xlsx'
     )
     output_group.add_argument(
         '--organize-by',
@@ -163,72 +318,45 @@ Examples:
     
     args = parser.parse_args()
     
-    # Determine which sources to include
-    # If no flags are set, fetch from all sources
-    if not any([
-        args.only_ncbi, args.only_10x, args.only_htan,
-        args.include_ncbi, args.include_10x, args.include_htan
-    ]):
-        args.include_ncbi = True
-        args.include_10x = True
-        args.include_htan = True
-    else:
-        # Handle --only flags
-        if args.only_ncbi:
-            args.include_ncbi = True
-            args.include_10x = False
-            args.include_htan = False
-        elif args.only_10x:
-            args.include_ncbi = False
-            args.include_10x = True
-            args.include_htan = False
-        elif args.only_htan:
-            args.include_ncbi = False
-            args.include_10x = False
-            args.include_htan = True
+    # Match the default file name to a non-Excel format
+    if args.output_format and args.output == DEFAULT_OUTPUT_FILE:
+        args.output = str(Path(args.output).with_suffix(f".{args.output_format}"))
+    
+    # Determine which sources to include:
+    # the first --only flag wins, then any --include flags, otherwise all sources
+    only = [key for _, key, _ in SOURCES if getattr(args, f"only_{key}")]
+    included = [key for _, key, _ in SOURCES if getattr(args, f"include_{key}")]
+    selected = only[:1] or included or [key for _, key, _ in SOURCES]
+    for _, key, _ in SOURCES:
+        setattr(args, f"include_{key}", key in selected)
+    
+    active = [(name, fetch) for name, key, fetch in SOURCES if key in selected]
     
     # Print banner
     print_banner()
     
-    # Show configuration
-    print("\n⚙️  Configuration:")
-    print(f"  • Data Sources: ", end="")
-    sources = []
-    if args.include_ncbi:
-        sources.append("NCBI GEO")
-    if args.include_10x:
-        sources.append("10x Genomics")
-    if args.include_htan:
-        sources.append("HTAN")
-    print(", ".join(sources))
-    
+    # Show configuration (written in one go)
+    config_lines = [
+        "\n⚙️  Configuration:",
+        f"  • Data Sources: {', '.join(name for name, _ in active)}",
+    ]
     if args.include_ncbi:
-        print(f"  • NCBI Max Results: {args.max_results}")
-    print(f"  • Organization: {args.organize_by}")
-    print(f"  • Output File: {args.output}")
-    
-    # Fetch data from all sources
-    all_datasets = []
+        config_lines.append(f"  • NCBI Max Results: {args.max_results}")
+    config_lines.append(f"  • Organization: {args.organize_by}")
+    config_lines.append(f"  • Output File: {args.output}")
+    config_lines.append(f"  • Response Cache: {'disabled' if args.no_cache else args.cache_dir}")
+    sys.stdout.write("\n".join(config_lines) + "\n")
     
     try:
-        # NCBI
-        ncbi_data = fetch_ncbi_data(args)
-        all_datasets.extend(ncbi_data)
-        
-        # 10x Genomics
-        tenx_data = fetch_10x_data(args)
-        all_datasets.extend(tenx_data)
-        
-        # HTAN
-        htan_data = fetch_htan_data(args)
-        all_datasets.extend(htan_data)
+        # Fetch data from all sources
+        all_datasets = fetch_sources([fetch for _, fetch in active], args)
         
         if not all_datasets:
             print("\n⚠️  No datasets found. Exiting.")
             return 1
         
-        # Export to Excel
-        exporter = ExcelExporter(args.output)
+        # Export catalog
+        exporter = CatalogExporter(args.output, output_format=args.output_format)
         exporter.export(all_datasets, separate_by=args.organize_by)
         
         print("\n✨ Success! Your spatial transcriptomics catalog is ready.")
@@ -1,5 +1,7 @@
 """Configuration and constants for ST data miner."""
 
+from types import MappingProxyType
+
 # NCBI E-utilities base URLs
 NCBI_ESEARCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esearch.fcgi"
 NCBI_ESUMMARY_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/esummary.fcgi"
@@ -7,23 +9,26 @@ NCBI_EFETCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
 
 # API rate limiting
 NCBI_REQUEST_DELAY = 0.4  # seconds between requests (NCBI allows 3 requests/second)
+NCBI_MAX_CONCURRENT_REQUESTS = 3  # ESummary chunks downloaded in parallel
 GENERAL_REQUEST_DELAY = 1.0  # for other APIs
 
+# On-disk response cache
+DEFAULT_CACHE_DIR = "~/.cache/st_miner"
+CACHE_EXPIRE_SECONDS = 86400  # 1 day
+
 # Default search parameters
 DEFAULT_NCBI_QUERY = '(("spatial transcriptomics"[All Fields] OR "Visium"[All Fields] OR "Slide-seq"[All Fields]) AND "gse"[Filter])'
 DEFAULT_MAX_RESULTS = 1000
 DEFAULT_CHUNK_SIZE = 100
 
-# Human organism identifiers
-HUMAN_ORGANISMS = [
-    "Homo sapiens",
-    "Human",
+# Human organism identifiers (lower-case; compare against lower-cased input)
+HUMAN_ORGANISMS = frozenset({
     "homo sapiens",
-    "human"
-]
+    "human",
+})
 
-# Platform mappings
-PLATFORM_MAPPINGS = {
+# Platform mappings (read-only)
+PLATFORM_MAPPINGS = MappingProxyType({
     "GPL24676": "10x Genomics Visium",
     "GPL21263": "10x Genomics 3' v3",
     "GPL20301": "10x Genomics 3' v2",
@@ -31,10 +36,11 @@ PLATFORM_MAPPINGS = {
     "GPL18573": "Illumina NextSeq",
     "GPL24247": "Slide-seq",
     "GPL29210": "Slide-seqV2",
-}
+})
 
 # Output file settings
 DEFAULT_OUTPUT_FILE = "spatial_transcriptomics_catalog.xlsx"
+OUTPUT_FORMATS = ("xlsx", "csv", "parquet", "feather")
 
 # Column order for output
 COLUMN_ORDER = [
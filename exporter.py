@@ -1,31 +1,89 @@
-"""Excel exporter with organization by platform and organism."""
+"""Catalog exporter: organized Excel workbooks or flat CSV/Parquet/Feather tables."""
 
+import sys
+import numpy as np
 import pandas as pd
-from typing import List, Dict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Dict, Optional, Tuple
 from pathlib import Path
-from utils import is_human_organism
-from config import COLUMN_ORDER
+from config import COLUMN_ORDER, OUTPUT_FORMATS
+from utils import HUMAN_ORGANISM_RE
 
+# Prefer xlsxwriter (faster); fall back to openpyxl's write-only mode
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
 
-class ExcelExporter:
-    """Exports spatial transcriptomics data to organized Excel files."""
+# Characters Excel forbids in sheet names: dropped or replaced with '-'
+_SHEET_TRANS = str.maketrans({
+    '[': '', ']': '', '*': '', '?': '',
+    '/': '-', '\\': '-', ':': '-',
+})
+
+
+# Layouts with a summary sheet and per-sheet serial numbers
+_ORGANIZED_LAYOUTS = ("both", "platform", "organism")
+
+
+def _serial_numbers(count: int) -> np.ndarray:
+    """Return 1..count for the S.No. column, as int16 when it fits (else int32)."""
+    dtype = np.int16 if count <= np.iinfo(np.int16).max else np.int32
+    return np.arange(1, count + 1, dtype=dtype)
+
+
+def _with_serial_numbers(df: pd.DataFrame) -> pd.DataFrame:
+    """Return a shallow copy of df with a fresh S.No. column in front."""
+    numbered = df.copy(deep=False)
+    numbered.insert(0, 'S.No.', _serial_numbers(len(df)))
+    return numbered
+
+
+def _value_counts(column: pd.Series) -> pd.Series:
+    """Return value_counts of a categorical column with ties in first-appearance order, as for object columns."""
+    counts = column.value_counts(sort=False)
+    return counts.reindex(column.dropna().unique()).sort_values(ascending=False, kind='stable')
+
+
+class CatalogExporter:
+    """Exports spatial transcriptomics data to organized Excel files or flat tables."""
     
-    def __init__(self, output_file: str = "st_catalog.xlsx"):
+    def __init__(self, output_file: str = "st_catalog.xlsx", output_format: Optional[str] = None):
         """
         Initialize exporter.
         
         Args:
-            output_file: Output Excel file path
+            output_file: Output file path
+            output_format: One of OUTPUT_FORMATS; inferred from the file suffix if None
         """
         self.output_file = output_file
+        self.output_format = output_format or self._format_from_suffix(output_file)
+    
+    @staticmethod
+    def _format_from_suffix(output_file: str) -> str:
+        """
+        Infer the output format from a file name.
+        
+        Args:
+            output_file: Output file path
+        
+        Returns:
+            Format name, defaulting to 'xlsx' for unknown suffixes
+        """
+        suffix = Path(output_file).suffix.lower().lstrip('.')
+        return suffix if suffix in OUTPUT_FORMATS else "xlsx"
     
     def export(self, datasets: List[Dict], separate_by: str = "both") -> None:
         """
-        Export datasets to Excel with organization.
+        Export datasets to Excel with organization, or to a flat table.
         
         Args:
             datasets: List of dataset dictionaries
             separate_by: How to organize data - 'platform', 'organism', or 'both'
+                (Excel only; flat formats always get a single table)
         """
         if not datasets:
             print("⚠️  No datasets to export.")
@@ -36,163 +94,330 @@ class ExcelExporter:
         # Convert to DataFrame
         df = pd.DataFrame(datasets)
         
-        # Add serial numbers
-        df.insert(0, 'S.No.', range(1, len(df) + 1))
+        # Low-cardinality text columns: categorical codes make splits and counts cheap
+        for col in ('Source', 'Platform', 'Organism'):
+            if col in df.columns:
+                df[col] = df[col].astype('category')
+        
+        # Add serial numbers (organized workbooks number each sheet instead)
+        organized = self.output_format == "xlsx" and separate_by in _ORGANIZED_LAYOUTS
+        if not organized:
+            df.insert(0, 'S.No.', _serial_numbers(len(df)))
         
         # Ensure column order
         available_columns = [col for col in COLUMN_ORDER if col in df.columns]
         other_columns = [col for col in df.columns if col not in COLUMN_ORDER]
         df = df[available_columns + other_columns]
         
+        # Classify organisms once; reused by every sheet and summary
+        human_mask = None
+        if 'Organism' in df.columns:
+            # On a categorical column this only evaluates the distinct organisms
+            # Same pattern as utils.is_human_organism, so the two tests cannot drift apart
+            human_mask = df['Organism'].str.contains(HUMAN_ORGANISM_RE, na=False)
+        
+        summary = self._compute_summary(df, human_mask)
+        
+        # Flat formats skip the (much slower) multi-sheet Excel path
+        if self.output_format != "xlsx":
+            self._export_flat(df)
+            print(f"✅ Export complete: {self.output_file}")
+            self._print_summary(summary)
+            return
+        
+        wb = self._new_workbook()
+        
+        # Summary sheet comes first in every organized layout
+        if organized:
+            self._write_summary_sheet(wb, summary)
+        
         if separate_by == "both":
-            self._export_by_platform_and_organism(df)
+            self._export_by_platform_and_organism(wb, df, human_mask)
         elif separate_by == "platform":
-            self._export_by_platform(df)
+            self._export_by_platform(wb, df)
         elif separate_by == "organism":
-            self._export_by_organism(df)
+            self._export_by_organism(wb, df, human_mask)
         else:
             # Single sheet export
-            self._export_single_sheet(df)
+            self._export_single_sheet(wb, df)
+        
+        self._close_workbook(wb)
         
         print(f"✅ Export complete: {self.output_file}")
-        self._print_summary(df)
+        self._print_summary(summary)
+    
+    def _export_flat(self, df: pd.DataFrame) -> None:
+        """
+        Export all data as a single CSV, Parquet or Feather table.
+        
+        Args:
+            df: DataFrame to export
+        """
+        if self.output_format == "csv":
+            df.to_csv(self.output_file, index=False)
+        elif self.output_format == "parquet":
+            df.to_parquet(self.output_file, index=False)
+        elif self.output_format == "feather":
+            df.reset_index(drop=True).to_feather(self.output_file)
+        else:
+            raise ValueError(f"Unsupported output format: {self.output_format}")
+    
+    def _new_workbook(self):
+        """
+        Create a streaming workbook for the output file.
+        
+        Returns:
+            xlsxwriter workbook in constant-memory mode, or an openpyxl
+            write-only workbook if xlsxwriter is not installed
+        """
+        if xlsxwriter is not None:
+            wb = xlsxwriter.Workbook(self.output_file, {
+                'constant_memory': True,
+                'default_date_format': 'yyyy-mm-dd',
+                'strings_to_formulas': False,
+                'strings_to_urls': False,
+            })
+            self._header_format = wb.add_format({'bold': True})
+            return wb
+        
+        return Workbook(write_only=True)
+    
+    def _close_workbook(self, wb) -> None:
+        """
+        Flush the workbook to the output file.
+        
+        Args:
+            wb: Workbook created by _new_workbook
+        """
+        if xlsxwriter is not None:
+            wb.close()
+        else:
+            wb.save(self.output_file)
+    
+    def _write_sheet(self, wb, name: str, df: pd.DataFrame) -> None:
+        """
+        Append a DataFrame as a new sheet of the workbook.
+        
+        Args:
+            wb: Workbook created by _new_workbook
+            name: Sheet name
+            df: DataFrame to write (header row + values)
+        """
+        # Convert datetime columns to Python datetimes once, not per cell
+        date_cols = df.select_dtypes(include='datetime').columns
+        values = df.assign(**{
+            col: pd.Series(df[col].dt.to_pydatetime(), index=df.index, dtype=object)
+            for col in date_cols
+        })
+        
+        # Missing values become empty cells, as with to_excel
+        values = values.astype(object).where(df.notna(), None)
+        
+        # Plain tuples straight from the column arrays (no per-row Series)
+        rows = values.itertuples(index=False, name=None)
+        
+        if xlsxwriter is not None:
+            ws = wb.add_worksheet(name)
+            ws.write_row(0, 0, [str(col) for col in df.columns], self._header_format)
+            for row_num, row in enumerate(rows, start=1):
+                ws.write_row(row_num, 0, row)
+            return
+        
+        ws = wb.create_sheet(title=name)
+        
+        header_font = Font(bold=True)
+        header = []
+        for col in df.columns:
+            cell = WriteOnlyCell(ws, value=str(col))
+            cell.font = header_font
+            header.append(cell)
+        ws.append(header)
+        
+        for row in rows:
+            ws.append(row)
     
-    def _export_single_sheet(self, df: pd.DataFrame) -> None:
+    def _export_single_sheet(self, wb, df: pd.DataFrame) -> None:
         """
         Export all data to a single sheet.
         
         Args:
+            wb: Workbook being written
             df: DataFrame to export
         """
-        with pd.ExcelWriter(self.output_file, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='All Datasets', index=False)
+        self._write_sheet(wb, 'All Datasets', df)
     
-    def _export_by_platform(self, df: pd.DataFrame) -> None:
+    def _export_by_platform(self, wb, df: pd.DataFrame) -> None:
         """
         Export data organized by platform (separate sheets).
         
         Args:
+            wb: Workbook being written
             df: DataFrame to export
         """
-        with pd.ExcelWriter(self.output_file, engine='openpyxl') as writer:
-            # Summary sheet
-            self._write_summary_sheet(writer, df)
-            
-            # Group by platform
-            if 'Source' in df.columns:
-                grouped = df.groupby('Source')
-                
-                for platform, group_df in grouped:
-                    # Reset serial numbers for each sheet
-                    sheet_df = group_df.copy()
-                    sheet_df['S.No.'] = range(1, len(sheet_df) + 1)
-                    
-                    sheet_name = self._sanitize_sheet_name(platform)
-                    sheet_df.to_excel(writer, sheet_name=sheet_name, index=False)
-    
-    def _export_by_organism(self, df: pd.DataFrame) -> None:
+        # Group by platform
+        if 'Source' in df.columns:
+            jobs = self._platform_jobs(df)
+            for sheet_name, sheet_df in self._prepare_sheets(jobs):
+                self._write_sheet(wb, sheet_name, sheet_df)
+    
+    def _export_by_organism(self, wb, df: pd.DataFrame, human_mask: Optional[pd.Series]) -> None:
         """
         Export data organized by organism (human vs others).
         
         Args:
+            wb: Workbook being written
             df: DataFrame to export
+            human_mask: Boolean Series marking human datasets (None if no Organism column)
         """
-        with pd.ExcelWriter(self.output_file, engine='openpyxl') as writer:
-            # Summary sheet
-            self._write_summary_sheet(writer, df)
+        # Separate human and non-human
+        if human_mask is not None:
+            human_df = df.loc[human_mask]
+            other_df = df.loc[~human_mask]
+            
+            if not human_df.empty:
+                self._write_sheet(wb, 'Human', _with_serial_numbers(human_df))
             
-            # Separate human and non-human
-            if 'Organism' in df.columns:
-                human_df = df[df['Organism'].apply(is_human_organism)].copy()
-                other_df = df[~df['Organism'].apply(is_human_organism)].copy()
-                
-                if not human_df.empty:
-                    human_df['S.No.'] = range(1, len(human_df) + 1)
-                    human_df.to_excel(writer, sheet_name='Human', index=False)
-                
-                if not other_df.empty:
-                    other_df['S.No.'] = range(1, len(other_df) + 1)
-                    other_df.to_excel(writer, sheet_name='Other Organisms', index=False)
-    
-    def _export_by_platform_and_organism(self, df: pd.DataFrame) -> None:
+            if not other_df.empty:
+                self._write_sheet(wb, 'Other Organisms', _with_serial_numbers(other_df))
+    
+    def _export_by_platform_and_organism(self, wb, df: pd.DataFrame, human_mask: Optional[pd.Series]) -> None:
         """
         Export data organized by both platform and organism.
         
         Args:
+            wb: Workbook being written
             df: DataFrame to export
+            human_mask: Boolean Series marking human datasets (None if no Organism column)
         """
-        with pd.ExcelWriter(self.output_file, engine='openpyxl') as writer:
-            # Summary sheet
-            self._write_summary_sheet(writer, df)
-            
-            # Separate by organism first
-            if 'Organism' in df.columns:
-                human_df = df[df['Organism'].apply(is_human_organism)].copy()
-                other_df = df[~df['Organism'].apply(is_human_organism)].copy()
-                
-                # Export human data by platform
-                if not human_df.empty:
-                    self._export_organism_by_platform(writer, human_df, "Human")
-                
-                # Export other organisms by platform
-                if not other_df.empty:
-                    self._export_organism_by_platform(writer, other_df, "Other")
+        # Separate by organism first, then by platform
+        if human_mask is not None and 'Source' in df.columns:
+            jobs = (self._platform_jobs(df.loc[human_mask], "Human") +
+                    self._platform_jobs(df.loc[~human_mask], "Other"))
+            for sheet_name, sheet_df in self._prepare_sheets(jobs):
+                self._write_sheet(wb, sheet_name, sheet_df)
     
-    def _export_organism_by_platform(self, writer, df: pd.DataFrame, organism_label: str) -> None:
+    def _platform_jobs(self, df: pd.DataFrame, organism_label: Optional[str] = None) -> List[Tuple]:
         """
-        Export organism data organized by platform.
+        List the per-platform sheets to build from a DataFrame.
         
         Args:
-            writer: Excel writer object
-            df: DataFrame to export
-            organism_label: Label for organism group (e.g., 'Human', 'Other')
+            df: DataFrame to split by platform
+            organism_label: Label for organism group (e.g., 'Human', 'Other'), if any
+        
+        Returns:
+            List of (DataFrame, platform, organism_label) jobs
+        """
+        if df.empty:
+            return []
+        return [(df, platform, organism_label) for platform in df['Source'].cat.categories]
+    
+    def _prepare_sheets(self, jobs: List[Tuple]) -> List[Tuple[str, pd.DataFrame]]:
+        """
+        Build platform sheet frames in parallel.
+        
+        Filtering and renumbering are independent per sheet, so they run on
+        a thread pool; the workbook itself is written by the caller, serially.
+        
+        Args:
+            jobs: Jobs from _platform_jobs
+        
+        Returns:
+            List of (sheet name, DataFrame) pairs in job order, skipping empty sheets
+        """
+        if not jobs:
+            return []
+        
+        with ThreadPoolExecutor(max_workers=min(8, len(jobs))) as executor:
+            sheets = executor.map(lambda job: self._prepare_platform_sheet(*job), jobs)
+            return [sheet for sheet in sheets if sheet is not None]
+    
+    def _prepare_platform_sheet(self, df: pd.DataFrame, platform: str,
+                                organism_label: Optional[str]) -> Optional[Tuple[str, pd.DataFrame]]:
         """
+        Build the sheet for one platform.
+        
+        Args:
+            df: DataFrame to filter
+            platform: Source value to keep
+            organism_label: Label for organism group (e.g., 'Human', 'Other'), if any
+        
+        Returns:
+            (sheet name, DataFrame) pair, or None if the platform has no rows
+        """
+        group_df = df[df['Source'] == platform]
+        if group_df.empty:
+            return None
+        
+        # Reset serial numbers for each sheet
+        sheet_df = _with_serial_numbers(group_df)
+        
+        # Create sheet name like "Human - NCBI GEO"
+        sheet_name = platform if organism_label is None else f"{organism_label} - {platform}"
+        return self._sanitize_sheet_name(sheet_name), sheet_df
+    
+    def _compute_summary(self, df: pd.DataFrame, human_mask: Optional[pd.Series]) -> Dict[str, Any]:
+        """
+        Compute summary statistics in a single pass over the data.
+        
+        Args:
+            df: DataFrame with all data
+            human_mask: Boolean Series marking human datasets (None if no Organism column)
+        
+        Returns:
+            Dictionary of statistics shared by the summary sheet and console output
+        """
+        summary = {
+            'total': len(df),
+            'platform_counts': None,
+            'human': None,
+            'other': None,
+            'unique_organisms': None,
+            'top_organisms': None,
+        }
+        
         if 'Source' in df.columns:
-            grouped = df.groupby('Source')
-            
-            for platform, group_df in grouped:
-                sheet_df = group_df.copy()
-                sheet_df['S.No.'] = range(1, len(sheet_df) + 1)
-                
-                # Create sheet name like "Human - NCBI GEO"
-                sheet_name = f"{organism_label} - {platform}"
-                sheet_name = self._sanitize_sheet_name(sheet_name)
-                
-                sheet_df.to_excel(writer, sheet_name=sheet_name, index=False)
-    
-    def _write_summary_sheet(self, writer, df: pd.DataFrame) -> None:
+            summary['platform_counts'] = _value_counts(df['Source'])
+        
+        if human_mask is not None:
+            summary['human'] = int(human_mask.sum())
+            summary['other'] = len(df) - summary['human']
+        
+        if 'Organism' in df.columns:
+            organism_counts = _value_counts(df['Organism'])
+            summary['unique_organisms'] = len(organism_counts)
+            summary['top_organisms'] = organism_counts.head(5)
+        
+        return summary
+    
+    def _write_summary_sheet(self, wb, summary: Dict[str, Any]) -> None:
         """
         Write summary statistics sheet.
         
         Args:
-            writer: Excel writer object
-            df: DataFrame with all data
+            wb: Workbook being written
+            summary: Statistics from _compute_summary
         """
         summary_data = []
         
         # Total datasets
-        summary_data.append({"Metric": "Total Datasets", "Value": len(df)})
+        summary_data.append({"Metric": "Total Datasets", "Value": summary['total']})
         
         # By platform
-        if 'Source' in df.columns:
-            platform_counts = df['Source'].value_counts()
-            for platform, count in platform_counts.items():
+        if summary['platform_counts'] is not None:
+            for platform, count in summary['platform_counts'].items():
                 summary_data.append({"Metric": f"  {platform}", "Value": count})
         
         # By organism
-        if 'Organism' in df.columns:
-            human_count = df['Organism'].apply(is_human_organism).sum()
-            other_count = len(df) - human_count
-            summary_data.append({"Metric": "Human Datasets", "Value": human_count})
-            summary_data.append({"Metric": "Other Organisms", "Value": other_count})
+        if summary['human'] is not None:
+            summary_data.append({"Metric": "Human Datasets", "Value": summary['human']})
+            summary_data.append({"Metric": "Other Organisms", "Value": summary['other']})
         
         # Unique organisms
-        if 'Organism' in df.columns:
-            unique_organisms = df['Organism'].nunique()
-            summary_data.append({"Metric": "Unique Organisms", "Value": unique_organisms})
+        if summary['unique_organisms'] is not None:
+            summary_data.append({"Metric": "Unique Organisms", "Value": summary['unique_organisms']})
         
         summary_df = pd.DataFrame(summary_data)
-        summary_df.to_excel(writer, sheet_name='Summary', index=False)
+        self._write_sheet(wb, 'Summary', summary_df)
     
     def _sanitize_sheet_name(self, name: str) -> str:
         """
@@ -205,43 +430,41 @@ class ExcelExporter:
             Sanitized sheet name
         """
         # Excel sheet names can't exceed 31 characters and can't contain certain characters
-        name = name.replace('[', '').replace(']', '').replace('*', '').replace('?', '')
-        name = name.replace('/', '-').replace('\\', '-').replace(':', '-')
-        
-        if len(name) > 31:
-            name = name[:31]
-        
-        return name
+        return name.translate(_SHEET_TRANS)[:31]
     
-    def _print_summary(self, df: pd.DataFrame) -> None:
+    def _print_summary(self, summary: Dict[str, Any]) -> None:
         """
         Print summary statistics to console.
         
         Args:
-            df: DataFrame with all data
+            summary: Statistics from _compute_summary
         """
-        print("\n" + "="*50)
-        print("  SUMMARY")
-        print("="*50)
-        print(f"Total Datasets: {len(df)}")
+        # Build the whole block and write it once
+        lines = [
+            "\n" + "="*50,
+            "  SUMMARY",
+            "="*50,
+            f"Total Datasets: {summary['total']}",
+        ]
         
-        if 'Source' in df.columns:
-            print("\nBy Platform:")
-            platform_counts = df['Source'].value_counts()
-            for platform, count in platform_counts.items():
-                print(f"  • {platform}: {count}")
+        if summary['platform_counts'] is not None:
+            lines.append("\nBy Platform:")
+            for platform, count in summary['platform_counts'].items():
+                lines.append(f"  • {platform}: {count}")
         
-        if 'Organism' in df.columns:
-            human_count = df['Organism'].apply(is_human_organism).sum()
-            other_count = len(df) - human_count
-            print(f"\nBy Organism:")
-            print(f"  • Human: {human_count}")
-            print(f"  • Other Organisms: {other_count}")
+        if summary['human'] is not None:
+            lines.append("\nBy Organism:")
+            lines.append(f"  • Human: {summary['human']}")
+            lines.append(f"  • Other Organisms: {summary['other']}")
             
             # Top organisms
-            print(f"\nTop 5 Organisms:")
-            top_organisms = df['Organism'].value_counts().head(5)
-            for organism, count in top_organisms.items():
-                print(f"  • {organism}: {count}")
+            lines.append("\nTop 5 Organisms:")
+            for organism, count in summary['top_organisms'].items():
+                lines.append(f"  • {organism}: {count}")
         
-        print("="*50 + "\n")
+        lines.append("="*50 + "\n")
+        sys.stdout.write("\n".join(lines) + "\n")
+
+
+# Backwards-compatible name
+ExcelExporter = CatalogExporter
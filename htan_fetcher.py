@@ -1,19 +1,213 @@
 """HTAN (Human Tumor Atlas Network) data fetcher with comprehensive dataset coverage."""
 
 import requests
-import time
-from typing import List, Dict, Optional
-import json
+import threading
+from typing import List, Dict, Optional, Tuple
+from utils import dedupe_datasets, loads_json, stable_id
+from cache import ResponseCache
 
 
 GENERAL_REQUEST_DELAY = 1.0  # seconds between requests
 
+# Assay-name substrings (lowercase) that mark an HTAN file as spatial data
+_SPATIAL_ASSAY_KEYWORDS = ('spatial', 'imaging')
+
+# (assay-name substring, platform), checked in order
+_ASSAY_PLATFORMS = (
+    ('slide-seq', "HTAN - Slide-seq"),
+    ('merfish', "HTAN - MERFISH"),
+)
+
+# Curated HTAN spatial transcriptomics datasets (fallback when live fetching fails).
+# Built once at import; _get_curated_htan_datasets hands out copies.
+_CURATED_HTAN_DATASETS = (
+    # Breast Cancer Atlases
+    {
+        "Platform": "HTAN - Visium",
+        "Accession": "HTA1_Breast_001",
+        "Title": "HTAN Vanderbilt Breast Cancer Pre-Cancer Atlas - Spatial Transcriptomics",
+        "Public Date": "2021",
+        "Experiment Type": "Spatial Transcriptomics - Visium",
+        "Organism": "Homo sapiens",
+        "Summary (for Tissue)": "Breast tissue including normal, pre-cancerous, and invasive carcinoma regions with spatial gene expression profiling",
+        "Samples": "Multiple",
+        "Publication": "34914614",  # PMID for HTAN breast paper
+        "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+Vanderbilt",
+        "Source": "HTAN" 
+    },
+    {
+        "Platform": "HTAN - Visium",
+        "Accession": "HTA1_Breast_002",
+        "Title": "HTAN HMS Breast Cancer Spatial Atlas",
+        "Public Date": "2022",
+        "Experiment Type": "Spatial Transcriptomics - Visium",
+        "Organism": "Homo sapiens",
+        "Summary (for Tissue)": "Triple-negative breast cancer spatial profiling with matched scRNA-seq",
+        "Samples": "Multiple",
+        "Publication": "",
+        "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+HMS",
+        "Source": "HTAN"
+    },
+    
+    # Colorectal Cancer Atlases
+    {
+        "Platform": "HTAN - Visium",
+        "Accession": "HTA2_CRC_001",
+        "Title": "HTAN HTAPP Colorectal Cancer Spatial Transcriptomics",
+        "Public Date": "2021",
+        "Experiment Type": "Spatial Transcriptomics - Visium",
+        "Organism": "Homo sapiens",
+        "Summary (for Tissue)": "Colorectal adenocarcinoma tissue with spatial transcriptomics profiling covering tumor microenvironment",
+        "Samples": "Multiple",
+        "Publication": "",
+        "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+HTAPP",
+        "Source": "HTAN"
+    },
+    
+    # Lung Cancer Atlases
+    {
+        "Platform": "HTAN - Visium",
+        "Accession": "HTA3_Lung_001",
+        "Title": "HTAN WUSTL Lung Cancer Spatial Profiling",
+        "Public Date": "2022",
+        "Experiment Type": "Spatial Transcriptomics - Visium",
+        "Organism": "Homo sapiens",
+        "Summary (for Tissue)": "Lung adenocarcinoma spatial gene expression with focus on tumor-immune interactions",
+        "Samples": "Multiple",
+        "Publication": "",
+        "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+WUSTL",
+        "Source": "HTAN"
+    },
+    {
+        "Platform": "HTAN - Visium",
+        "Accession": "HTA3_Lung_002",
+        "Title": "HTAN Stanford Lung Cancer Spatial Atlas",
+        "Public Date": "2022",
+        "Experiment Type": "Spatial Transcriptomics - Visium",
+        "Organism": "Homo sapiens",
+        "Summary (for Tissue)": "Non-small cell lung cancer spatial profiling",
+        "Samples": "Multiple",
+        "Publication": "",
+        "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+Stanford",
+        "Source": "HTAN"
+    },
+    
+    # Brain/Glioblastoma Atlases  
+    {
+        "Platform": "HTAN - Slide-seq",
+        "Accession": "HTA4_GBM_001",
+        "Title": "HTAN HMS Glioblastoma Spatial Atlas - Slide-seq",
+        "Public Date": "2022",
+        "Experiment Type": "Spatial Transcriptomics - Slide-seq",
+        "Organism": "Homo sapiens",
+        "Summary (for Tissue)": "Glioblastoma tumor tissue spatial transcriptomics at single-cell resolution using Slide-seq",
+        "Samples": "Multiple",
+        "Publication": "32271205",  # PMID for Slide-seq paper
+        "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+HMS",
+        "Source": "HTAN"
+    },
+    {
+        "Platform": "HTAN - Visium",
+        "Accession": "HTA4_GBM_002",
+        "Title": "HTAN HMS Glioblastoma Spatial Atlas - Visium",
+        "Public Date": "2022",
+        "Experiment Type": "Spatial Transcriptomics - Visium",
+        "Organism": "Homo sapiens",
+        "Summary (for Tissue)": "Glioblastoma multiforme spatial profiling with Visium",
+        "Samples": "Multiple",
+        "Publication": "",
+        "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+HMS",
+        "Source": "HTAN"
+    },
+    
+    # Pancreatic Cancer Atlases
+    {
+        "Platform": "HTAN - Visium",
+        "Accession": "HTA5_Pancreas_001",
+        "Title": "HTAN Duke Pancreatic Cancer Spatial Dataset",
+        "Public Date": "2022",
+        "Experiment Type": "Spatial Transcriptomics - Visium",
+        "Organism": "Homo sapiens",
+        "Summary (for Tissue)": "Pancreatic ductal adenocarcinoma spatial profiling with emphasis on stromal compartments",
+        "Samples": "Multiple",
+        "Publication": "",
+        "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+Duke",
+        "Source": "HTAN"
+    },
+    {
+        "Platform": "HTAN - Visium",
+        "Accession": "HTA5_Pancreas_002",
+        "Title": "HTAN Oregon Pancreatic Cancer Pre-Cancer Atlas",
+        "Public Date": "2023",
+        "Experiment Type": "Spatial Transcriptomics - Visium",
+        "Organism": "Homo sapiens",
+        "Summary (for Tissue)": "Pancreatic pre-cancer and cancer progression spatial profiling",
+        "Samples": "Multiple",
+        "Publication": "",
+        "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+OHSU",
+        "Source": "HTAN"
+    },
+    
+    # Melanoma Atlases
+    {
+        "Platform": "HTAN - Visium",
+        "Accession": "HTA6_Melanoma_001",
+        "Title": "HTAN OHSU Melanoma Spatial Transcriptomics",
+        "Public Date": "2022",
+        "Experiment Type": "Spatial Transcriptomics - Visium",
+        "Organism": "Homo sapiens",
+        "Summary (for Tissue)": "Cutaneous melanoma spatial profiling including primary and metastatic sites",
+        "Samples": "Multiple",
+        "Publication": "",
+        "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+OHSU",
+        "Source": "HTAN"
+    },
+    
+    # Prostate Cancer Atlases
+    {
+        "Platform": "HTAN - Visium",
+        "Accession": "HTA7_Prostate_001",
+        "Title": "HTAN MSK Prostate Cancer Spatial Atlas",
+        "Public Date": "2023",
+        "Experiment Type": "Spatial Transcriptomics - Visium",
+        "Organism": "Homo sapiens",
+        "Summary (for Tissue)": "Prostate adenocarcinoma spatial transcriptomics with focus on tumor heterogeneity",
+        "Samples": "Multiple",
+        "Publication": "",
+        "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+MSK",
+        "Source": "HTAN"
+    },
+    
+    # Ovarian Cancer Atlases
+    {
+        "Platform": "HTAN - Visium",
+        "Accession": "HTA8_Ovarian_001",
+        "Title": "HTAN DFCI Ovarian Cancer Spatial Dataset",
+        "Public Date": "2023",
+        "Experiment Type": "Spatial Transcriptomics - Visium",
+        "Organism": "Homo sapiens",
+        "Summary (for Tissue)": "High-grade serous ovarian carcinoma spatial transcriptomics",
+        "Samples": "Multiple",
+        "Publication": "",
+        "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+DFCI",
+        "Source": "HTAN"
+    },
+)
+
 
 class HTANFetcher:
     """Fetches spatial transcriptomics data from HTAN."""
     
-    def __init__(self):
-        """Initialize HTAN fetcher."""
+    def __init__(self, cache: Optional[ResponseCache] = None, stop_event: Optional[threading.Event] = None):
+        """
+        Initialize HTAN fetcher.
+        
+        Args:
+            cache: On-disk cache for API responses (None disables caching)
+            stop_event: When set, no further endpoints are requested (e.g. on Ctrl-C)
+        """
+        self.cache = cache
+        self.stop_event = stop_event or threading.Event()
         self.base_url = "https://humantumoratlas.org"
         self.data_portal_url = "https://data.humantumoratlas.org"
         # HTAN uses Synapse API
@@ -77,37 +271,72 @@ class HTANFetcher:
             "https://www.synapse.org/rest/datasets/htan",
         ]
         
+        # Endpoints are tried in order and the first one with usable data wins;
+        # the rest are never requested, so a fast first endpoint is all a cold start pays for
         for endpoint in api_endpoints:
-            try:
-                response = self.session.get(endpoint, timeout=30)
-                if response.status_code == 200:
-                    data = response.json()
-                    parsed = self._parse_htan_api_response(data)
-                    if parsed:
-                        datasets.extend(parsed)
-                        break
-                
-                time.sleep(self.request_delay)
-                
-            except Exception as e:
-                continue
+            parsed = self._fetch_endpoint(endpoint)
+            if parsed:
+                datasets.extend(parsed)
+                break
         
         # If API doesn't work, try scraping the portal
         if not datasets:
             datasets = self._scrape_htan_portal()
         
         # Remove duplicates
-        if datasets:
-            seen = set()
-            unique_datasets = []
-            for d in datasets:
-                key = d['Title']
-                if key not in seen:
-                    seen.add(key)
-                    unique_datasets.append(d)
-            return unique_datasets
+        return dedupe_datasets(datasets)
+    
+    def _fetch_endpoint(self, endpoint: str) -> List[Dict]:
+        """
+        Fetch and parse one HTAN API endpoint.
+        
+        Args:
+            endpoint: Endpoint URL
+        
+        Returns:
+            List of dataset dictionaries (empty if the endpoint failed)
+        """
+        if self.stop_event.is_set():
+            return []
         
-        return []
+        try:
+            content, fresh = self._get(endpoint)
+            if content is None:
+                return []
+            parsed = self._parse_htan_api_response(loads_json(content))
+        except Exception:
+            return []
+        
+        # Only cache responses that yielded datasets; soft errors are retried next run
+        if fresh and parsed and self.cache:
+            self.cache.set(endpoint, None, content)
+        return parsed
+    
+    def _get(self, url: str) -> Tuple[Optional[bytes], bool]:
+        """
+        GET an API endpoint, reading through the response cache.
+        
+        Args:
+            url: Endpoint URL
+        
+        Returns:
+            Response body (None if the endpoint did not return 200), and whether
+            it was freshly downloaded and so still needs caching
+        """
+        content = self.cache.get(url) if self.cache else None
+        if content is not None:
+            return content, False
+        
+        try:
+            response = self.session.get(url, timeout=30)
+        except requests.RequestException:
+            # Network failure: fall back to an expired cached copy, if any
+            return (self.cache.get(url, allow_stale=True) if self.cache else None), False
+        
+        if response.status_code != 200:
+            return None, False
+        
+        return response.content, True
     
     def _parse_htan_api_response(self, data: dict) -> List[Dict]:
         """Parse HTAN API response."""
@@ -124,20 +353,25 @@ class HTANFetcher:
                 # Check if it's spatial transcriptomics
                 assay = item.get('assayName', item.get('assay', ''))
                 file_type = item.get('fileFormat', item.get('Component', ''))
+                assay_lower = str(assay).lower()
                 
-                if 'spatial' not in str(assay).lower() and 'imaging' not in str(assay).lower():
+                if not any(keyword in assay_lower for keyword in _SPATIAL_ASSAY_KEYWORDS):
                     continue
                 
-                # Determine platform
-                platform = "HTAN - Visium"
-                if 'slide-seq' in str(assay).lower():
-                    platform = "HTAN - Slide-seq"
-                elif 'merfish' in str(assay).lower():
-                    platform = "HTAN - MERFISH"
+                # Determine platform (Visium unless the assay names another technology)
+                platform = next(
+                    (name for keyword, name in _ASSAY_PLATFORMS if keyword in assay_lower),
+                    "HTAN - Visium"
+                )
+                
+                accession = item.get('HTANDataFileID', item.get('id'))
+                if accession is None:
+                    # Content hash, so the fallback accession is the same on every run
+                    accession = f"HTAN_{stable_id(item)}"
                 
                 dataset = {
                     "Platform": platform,
-                    "Accession": item.get('HTANDataFileID', item.get('id', f"HTAN_{hash(str(item)) % 10000}")),
+                    "Accession": accession,
                     "Title": item.get('description', item.get('name', item.get('HTANParentDataFileID', 'HTAN Dataset'))),
                     "Public Date": item.get('releaseDate', ''),
                     "Experiment Type": assay or "Spatial Transcriptomics",
@@ -191,181 +425,7 @@ class HTANFetcher:
         Returns:
             List of dataset dictionaries with 12 comprehensive cancer atlas datasets
         """
-        datasets = [
-            # Breast Cancer Atlases
-            {
-                "Platform": "HTAN - Visium",
-                "Accession": "HTA1_Breast_001",
-                "Title": "HTAN Vanderbilt Breast Cancer Pre-Cancer Atlas - Spatial Transcriptomics",
-                "Public Date": "2021",
-                "Experiment Type": "Spatial Transcriptomics - Visium",
-                "Organism": "Homo sapiens",
-                "Summary (for Tissue)": "Breast tissue including normal, pre-cancerous, and invasive carcinoma regions with spatial gene expression profiling",
-                "Samples": "Multiple",
-                "Publication": "34914614",  # PMID for HTAN breast paper
-                "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+Vanderbilt",
-                "Source": "HTAN" 
-            },
-            {
-                "Platform": "HTAN - Visium",
-                "Accession": "HTA1_Breast_002",
-                "Title": "HTAN HMS Breast Cancer Spatial Atlas",
-                "Public Date": "2022",
-                "Experiment Type": "Spatial Transcriptomics - Visium",
-                "Organism": "Homo sapiens",
-                "Summary (for Tissue)": "Triple-negative breast cancer spatial profiling with matched scRNA-seq",
-                "Samples": "Multiple",
-                "Publication": "",
-                "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+HMS",
-                "Source": "HTAN"
-            },
-            
-            # Colorectal Cancer Atlases
-            {
-                "Platform": "HTAN - Visium",
-                "Accession": "HTA2_CRC_001",
-                "Title": "HTAN HTAPP Colorectal Cancer Spatial Transcriptomics",
-                "Public Date": "2021",
-                "Experiment Type": "Spatial Transcriptomics - Visium",
-                "Organism": "Homo sapiens",
-                "Summary (for Tissue)": "Colorectal adenocarcinoma tissue with spatial transcriptomics profiling covering tumor microenvironment",
-                "Samples": "Multiple",
-                "Publication": "",
-                "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+HTAPP",
-                "Source": "HTAN"
-            },
-            
-            # Lung Cancer Atlases
-            {
-                "Platform": "HTAN - Visium",
-                "Accession": "HTA3_Lung_001",
-                "Title": "HTAN WUSTL Lung Cancer Spatial Profiling",
-                "Public Date": "2022",
-                "Experiment Type": "Spatial Transcriptomics - Visium",
-                "Organism": "Homo sapiens",
-                "Summary (for Tissue)": "Lung adenocarcinoma spatial gene expression with focus on tumor-immune interactions",
-                "Samples": "Multiple",
-                "Publication": "",
-                "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+WUSTL",
-                "Source": "HTAN"
-            },
-            {
-                "Platform": "HTAN - Visium",
-                "Accession": "HTA3_Lung_002",
-                "Title": "HTAN Stanford Lung Cancer Spatial Atlas",
-                "Public Date": "2022",
-                "Experiment Type": "Spatial Transcriptomics - Visium",
-                "Organism": "Homo sapiens",
-                "Summary (for Tissue)": "Non-small cell lung cancer spatial profiling",
-                "Samples": "Multiple",
-                "Publication": "",
-                "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+Stanford",
-                "Source": "HTAN"
-            },
-            
-            # Brain/Glioblastoma Atlases  
-            {
-                "Platform": "HTAN - Slide-seq",
-                "Accession": "HTA4_GBM_001",
-                "Title": "HTAN HMS Glioblastoma Spatial Atlas - Slide-seq",
-                "Public Date": "2022",
-                "Experiment Type": "Spatial Transcriptomics - Slide-seq",
-                "Organism": "Homo sapiens",
-                "Summary (for Tissue)": "Glioblastoma tumor tissue spatial transcriptomics at single-cell resolution using Slide-seq",
-                "Samples": "Multiple",
-                "Publication": "32271205",  # PMID for Slide-seq paper
-                "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+HMS",
-                "Source": "HTAN"
-            },
-            {
-                "Platform": "HTAN - Visium",
-                "Accession": "HTA4_GBM_002",
-                "Title": "HTAN HMS Glioblastoma Spatial Atlas - Visium",
-                "Public Date": "2022",
-                "Experiment Type": "Spatial Transcriptomics - Visium",
-                "Organism": "Homo sapiens",
-                "Summary (for Tissue)": "Glioblastoma multiforme spatial profiling with Visium",
-                "Samples": "Multiple",
-                "Publication": "",
-                "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+HMS",
-                "Source": "HTAN"
-            },
-            
-            # Pancreatic Cancer Atlases
-            {
-                "Platform": "HTAN - Visium",
-                "Accession": "HTA5_Pancreas_001",
-                "Title": "HTAN Duke Pancreatic Cancer Spatial Dataset",
-                "Public Date": "2022",
-                "Experiment Type": "Spatial Transcriptomics - Visium",
-                "Organism": "Homo sapiens",
-                "Summary (for Tissue)": "Pancreatic ductal adenocarcinoma spatial profiling with emphasis on stromal compartments",
-                "Samples": "Multiple",
-                "Publication": "",
-                "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+Duke",
-                "Source": "HTAN"
-            },
-            {
-                "Platform": "HTAN - Visium",
-                "Accession": "HTA5_Pancreas_002",
-                "Title": "HTAN Oregon Pancreatic Cancer Pre-Cancer Atlas",
-                "Public Date": "2023",
-                "Experiment Type": "Spatial Transcriptomics - Visium",
-                "Organism": "Homo sapiens",
-                "Summary (for Tissue)": "Pancreatic pre-cancer and cancer progression spatial profiling",
-                "Samples": "Multiple",
-                "Publication": "",
-                "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+OHSU",
-                "Source": "HTAN"
-            },
-            
-            # Melanoma Atlases
-            {
-                "Platform": "HTAN - Visium",
-                "Accession": "HTA6_Melanoma_001",
-                "Title": "HTAN OHSU Melanoma Spatial Transcriptomics",
-                "Public Date": "2022",
-                "Experiment Type": "Spatial Transcriptomics - Visium",
-                "Organism": "Homo sapiens",
-                "Summary (for Tissue)": "Cutaneous melanoma spatial profiling including primary and metastatic sites",
-                "Samples": "Multiple",
-                "Publication": "",
-                "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+OHSU",
-                "Source": "HTAN"
-            },
-            
-            # Prostate Cancer Atlases
-            {
-                "Platform": "HTAN - Visium",
-                "Accession": "HTA7_Prostate_001",
-                "Title": "HTAN MSK Prostate Cancer Spatial Atlas",
-                "Public Date": "2023",
-                "Experiment Type": "Spatial Transcriptomics - Visium",
-                "Organism": "Homo sapiens",
-                "Summary (for Tissue)": "Prostate adenocarcinoma spatial transcriptomics with focus on tumor heterogeneity",
-                "Samples": "Multiple",
-                "Publication": "",
-                "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+MSK",
-                "Source": "HTAN"
-            },
-            
-            # Ovarian Cancer Atlases
-            {
-                "Platform": "HTAN - Visium",
-                "Accession": "HTA8_Ovarian_001",
-                "Title": "HTAN DFCI Ovarian Cancer Spatial Dataset",
-                "Public Date": "2023",
-                "Experiment Type": "Spatial Transcriptomics - Visium",
-                "Organism": "Homo sapiens",
-                "Summary (for Tissue)": "High-grade serous ovarian carcinoma spatial transcriptomics",
-                "Samples": "Multiple",
-                "Publication": "",
-                "Download Link": "https://data.humantumoratlas.org/explore?tab=atlas&selectedAtlasName=HTAN+DFCI",
-                "Source": "HTAN"
-            },
-        ]
-        
-        return datasets
+        return [dict(dataset) for dataset in _CURATED_HTAN_DATASETS]
 
 
 # Example usage
@@ -1,32 +1,81 @@
 """NCBI GEO data fetcher with improved XML parsing."""
 
 import requests
-import xml.etree.ElementTree as ET
+import io
+import sys
+import threading
 import time
-from typing import List, Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Iterator, Optional, Tuple
 from config import (
     NCBI_ESEARCH_URL,
     NCBI_ESUMMARY_URL,
     NCBI_REQUEST_DELAY,
+    NCBI_MAX_CONCURRENT_REQUESTS,
     DEFAULT_NCBI_QUERY,
     DEFAULT_MAX_RESULTS,
     DEFAULT_CHUNK_SIZE
 )
-from utils import safe_find_text, extract_pmid, map_platform_name, clean_text
+from utils import (
+    extract_pmid,
+    map_platform_name,
+    clean_text,
+    loads_json,
+    make_session,
+    build_item_index,
+    item_text,
+    iter_records,
+    ET
+)
+from cache import ResponseCache
+
+# (output column, DocSum Item Name, converter applied to the stripped text)
+_DOCSUM_TEXT_FIELDS = (
+    ("Platform", "GPL", map_platform_name),
+    ("Accession", "Accession", None),
+    ("Title", "title", clean_text),
+    ("Public Date", "PDAT", None),
+    ("Organism", "taxon", sys.intern),
+    ("Summary (for Tissue)", "summary", clean_text),
+    ("Samples", "n_samples", None),
+)
 
 
 class NCBIFetcher:
     """Fetches spatial transcriptomics data from NCBI GEO."""
     
-    def __init__(self, email: Optional[str] = None):
+    def __init__(self, email: Optional[str] = None, cache: Optional[ResponseCache] = None,
+                 stop_event: Optional[threading.Event] = None):
         """
         Initialize NCBI fetcher.
         
         Args:
             email: Email for NCBI API (optional but recommended)
+            cache: On-disk cache for ESummary responses (None disables caching)
+            stop_event: When set, remaining ESummary chunks are skipped (e.g. on Ctrl-C)
         """
         self.email = email
+        self.cache = cache
+        self.stop_event = stop_event or threading.Event()
         self.request_delay = NCBI_REQUEST_DELAY
+        # Request start times are spaced by request_delay across all worker threads
+        self._throttle_lock = threading.Lock()
+        self._next_request_time = 0.0
+        # History-server handle of the last search (usehistory=y)
+        self.webenv = None
+        self.query_key = None
+        # Reused across ESearch/ESummary calls so connections are kept alive
+        self.session = make_session({'User-Agent': 'ST_DataMiner/1.0'})
+    
+    def _throttle(self) -> None:
+        """Block until the next request may start without exceeding NCBI's rate limit."""
+        with self._throttle_lock:
+            now = time.monotonic()
+            wait = self._next_request_time - now
+            self._next_request_time = max(now, self._next_request_time) + self.request_delay
+        
+        if wait > 0:
+            time.sleep(wait)
     
     def search(self, query: str = DEFAULT_NCBI_QUERY, max_results: int = DEFAULT_MAX_RESULTS) -> List[str]:
         """
@@ -46,33 +95,69 @@ class NCBIFetcher:
             "term": query,
             "retmax": max_results,
             "usehistory": "y",
-            "retmode": "xml"
+            "retmode": "json"
         }
         
         if self.email:
             params["email"] = self.email
         
         try:
-            response = requests.get(NCBI_ESEARCH_URL, params=params, timeout=30)
+            response = self.session.get(NCBI_ESEARCH_URL, params=params, timeout=30)
             response.raise_for_status()
         except requests.RequestException as e:
             print(f"❌ Error during NCBI search: {e}")
             return []
         
         try:
-            root = ET.fromstring(response.content)
-            id_list = [id_elem.text for id_elem in root.findall(".//Id") if id_elem.text]
-            
-            if not id_list:
-                print("⚠️  No results found in NCBI GEO.")
+            result = loads_json(response.content)["esearchresult"]
+        except ValueError:
+            # Not JSON (HTML error page, truncated body): retry once as XML
+            result = self._search_xml(params)
+            if result is None:
                 return []
-            
-            print(f"✅ Found {len(id_list)} NCBI GEO study IDs")
-            return id_list
-            
-        except ET.ParseError as e:
+        except (KeyError, TypeError) as e:
             print(f"❌ Error parsing NCBI search results: {e}")
             return []
+        
+        id_list = [geo_id for geo_id in result.get("idlist", []) if geo_id]
+        
+        # Keep the history-server handle so summaries can be fetched without resending IDs
+        self.webenv = result.get("webenv")
+        self.query_key = result.get("querykey")
+        
+        if not id_list:
+            print("⚠️  No results found in NCBI GEO.")
+            return []
+        
+        print(f"✅ Found {len(id_list)} NCBI GEO study IDs")
+        return id_list
+    
+    def _search_xml(self, params: Dict) -> Optional[Dict]:
+        """
+        Repeat an ESearch request with retmode=xml, for when the JSON response is unreadable.
+        
+        Args:
+            params: ESearch query parameters of the JSON request
+        
+        Returns:
+            Dict shaped like the JSON "esearchresult" (idlist, webenv, querykey),
+            or None if the search failed again
+        """
+        print("⚠️  NCBI search returned invalid JSON; retrying with XML...")
+        
+        try:
+            response = self.session.get(NCBI_ESEARCH_URL, params=dict(params, retmode="xml"), timeout=30)
+            response.raise_for_status()
+            root = ET.fromstring(response.content)
+        except (requests.RequestException, ET.ParseError) as e:
+            print(f"❌ Error during NCBI search: {e}")
+            return None
+        
+        return {
+            "idlist": [id_elem.text for id_elem in root.findall("./IdList/Id")],
+            "webenv": root.findtext("WebEnv"),
+            "querykey": root.findtext("QueryKey"),
+        }
     
     def fetch_summaries(self, id_list: List[str], chunk_size: int = DEFAULT_CHUNK_SIZE) -> List[Dict]:
         """
@@ -88,116 +173,232 @@ class NCBIFetcher:
         if not id_list:
             return []
         
-        studies = []
-        total_chunks = (len(id_list) + chunk_size - 1) // chunk_size
+        chunk_params = self._id_chunk_params(id_list, chunk_size)
         
-        print(f"📥 Fetching summaries for {len(id_list)} studies in {total_chunks} chunks...")
+        print(f"📥 Fetching summaries for {len(id_list)} studies in {len(chunk_params)} chunks...")
+        return self._fetch_chunks(chunk_params)
+    
+    @staticmethod
+    def _id_chunk_params(id_list: List[str], chunk_size: int) -> List[Dict]:
+        """
+        ESummary query parameters for an ID list, one dict per chunk.
         
-        for i in range(0, len(id_list), chunk_size):
-            chunk = id_list[i:i + chunk_size]
-            chunk_num = i // chunk_size + 1
-            
-            print(f"   Processing chunk {chunk_num}/{total_chunks}...", end="\r")
-            
-            params = {
+        Args:
+            id_list: List of GEO IDs
+            chunk_size: Number of IDs per chunk
+        
+        Returns:
+            List of query parameter dicts
+        """
+        return [
+            {
                 "db": "gds",
-                "id": ",".join(chunk),
+                "id": ",".join(id_list[i:i + chunk_size]),
                 "retmode": "xml"
             }
-            
-            if self.email:
+            for i in range(0, len(id_list), chunk_size)
+        ]
+    
+    def fetch_summaries_via_history(self, webenv: str, query_key: str, count: int,
+                                    chunk_size: int = DEFAULT_CHUNK_SIZE,
+                                    id_list: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Fetch summaries for search results stored on the NCBI history server.
+        
+        Requests reference the result set by WebEnv/query_key and page through it
+        with retstart/retmax, so the ID list is never sent back to NCBI.
+        
+        Args:
+            webenv: WebEnv returned by ESearch
+            query_key: QueryKey returned by ESearch
+            count: Number of results to fetch
+            chunk_size: Number of summaries to fetch per request
+            id_list: IDs of the result set, in search order. WebEnv handles expire,
+                so chunks are cached under their IDs instead (shared with
+                fetch_summaries); without it the responses are not cached
+        
+        Returns:
+            List of study dictionaries
+        """
+        if not count:
+            return []
+        
+        chunk_params = [
+            {
+                "db": "gds",
+                "WebEnv": webenv,
+                "query_key": query_key,
+                "retstart": retstart,
+                "retmax": min(chunk_size, count - retstart),
+                "retmode": "xml"
+            }
+            for retstart in range(0, count, chunk_size)
+        ]
+        cache_keys = self._id_chunk_params(id_list, chunk_size) if id_list else [None] * len(chunk_params)
+        
+        print(f"📥 Fetching summaries for {count} studies in {len(chunk_params)} chunks...")
+        return self._fetch_chunks(chunk_params, cache_keys)
+    
+    def _fetch_chunks(self, chunk_params: List[Dict],
+                      cache_keys: Optional[List[Optional[Dict]]] = None) -> List[Dict]:
+        """
+        Download and parse ESummary chunks.
+        
+        Args:
+            chunk_params: ESummary query parameters, one dict per chunk
+            cache_keys: Parameters each chunk is cached under (None entries are
+                not cached); defaults to chunk_params
+        
+        Returns:
+            List of study dictionaries, in chunk order
+        """
+        if cache_keys is None:
+            cache_keys = chunk_params
+        
+        studies = []
+        total_chunks = len(chunk_params)
+        
+        if self.email:
+            for params in chunk_params:
                 params["email"] = self.email
+        
+        # Downloads overlap; parsing stays on this thread and follows chunk order
+        with ThreadPoolExecutor(max_workers=NCBI_MAX_CONCURRENT_REQUESTS) as executor:
+            contents = executor.map(self._fetch_summary_chunk, range(1, total_chunks + 1), chunk_params, cache_keys)
             
-            try:
-                response = requests.get(NCBI_ESUMMARY_URL, params=params, timeout=30)
-                response.raise_for_status()
+            for chunk_num, (cache_key, (content, fresh)) in enumerate(zip(cache_keys, contents), 1):
+                if self.stop_event.is_set():
+                    break
+                
+                print(f"   Processing chunk {chunk_num}/{total_chunks}...", end="\r")
+                
+                if content is None:
+                    continue
+                
+                try:
+                    chunk_studies = list(self._parse_summaries(content))
+                except ET.ParseError as e:
+                    # Malformed or truncated XML: drop the chunk rather than keep a partial one
+                    print(f"\n⚠️  XML parsing error in chunk {chunk_num}: {e}")
+                    continue
+                except Exception as e:
+                    print(f"\n⚠️  Error processing chunk {chunk_num}: {e}")
+                    continue
                 
-                # Parse this chunk
-                chunk_studies = self._parse_summaries(response.content)
                 studies.extend(chunk_studies)
                 
-            except requests.RequestException as e:
-                print(f"\n⚠️  Error fetching chunk {chunk_num}: {e}")
-                continue
-            except Exception as e:
-                print(f"\n⚠️  Error processing chunk {chunk_num}: {e}")
-                continue
-            
-            # Rate limiting
-            time.sleep(self.request_delay)
+                # Only cache bodies that parsed into records, so an NCBI <ERROR> or empty
+                # response is retried next run instead of being served from disk
+                if fresh and chunk_studies and self.cache and cache_key is not None:
+                    self.cache.set(NCBI_ESUMMARY_URL, cache_key, content)
         
         print(f"\n✅ Successfully parsed {len(studies)} NCBI GEO summaries")
         return studies
     
-    def _parse_summaries(self, xml_content: bytes) -> List[Dict]:
+    def _fetch_summary_chunk(self, chunk_num: int, params: Dict,
+                             cache_key: Optional[Dict]) -> Tuple[Optional[bytes], bool]:
         """
-        Parse XML summaries from NCBI.
+        Download the ESummary XML for one chunk.
         
         Args:
-            xml_content: XML response content
+            chunk_num: 1-based chunk number, for error messages
+            params: ESummary query parameters for this chunk
+            cache_key: Parameters the chunk is cached under (None: not cached)
         
         Returns:
-            List of parsed study dictionaries
+            Raw XML content (None if the request failed), and whether it was
+            freshly downloaded and so still needs caching
         """
-        studies = []
+        if self.stop_event.is_set():
+            return None, False
+        
+        use_cache = self.cache is not None and cache_key is not None
+        
+        # Summaries for a given set of IDs don't change: reuse cached copies
+        content = self.cache.get(NCBI_ESUMMARY_URL, cache_key) if use_cache else None
+        if content is not None:
+            return content, False
         
         try:
-            root = ET.fromstring(xml_content)
-        except ET.ParseError as e:
-            print(f"\n⚠️  XML parsing error: {e}")
-            return studies
+            # Rate limiting (network requests only)
+            self._throttle()
+            response = self.session.get(NCBI_ESUMMARY_URL, params=params, timeout=30)
+            response.raise_for_status()
+        except requests.RequestException as e:
+            # Network failure: an expired cached copy beats dropping the chunk
+            stale = self.cache.get(NCBI_ESUMMARY_URL, cache_key, allow_stale=True) if use_cache else None
+            if stale is not None:
+                print(f"\n⚠️  Error fetching chunk {chunk_num}: {e} (using expired cached copy)")
+                return stale, False
+            print(f"\n⚠️  Error fetching chunk {chunk_num}: {e}")
+            return None, False
+        
+        # Cached by _fetch_chunks once the body has parsed into records
+        return response.content, True
+    
+    def _parse_summaries(self, xml_content: bytes) -> Iterator[Dict]:
+        """
+        Parse XML summaries from NCBI, one DocSum at a time.
+        
+        Args:
+            xml_content: XML response content
         
-        for docsum in root.findall(".//DocSum"):
+        Yields:
+            Parsed study dictionaries
+        
+        Raises:
+            ET.ParseError: If the XML is malformed; the caller drops the whole chunk
+        """
+        # Streamed instead of fromstring: only the current DocSum is kept as a tree
+        for docsum in iter_records(io.BytesIO(xml_content), 'DocSum'):
             try:
-                # Extract basic fields
-                accession = safe_find_text(docsum, 'Name', 'Accession')
-                title = clean_text(safe_find_text(docsum, 'Name', 'title'))
-                public_date = safe_find_text(docsum, 'Name', 'PDAT')
-                organism = safe_find_text(docsum, 'Name', 'taxon')
-                summary = clean_text(safe_find_text(docsum, 'Name', 'summary'))
-                platform_gpl = safe_find_text(docsum, 'Name', 'GPL')
-                samples = safe_find_text(docsum, 'Name', 'n_samples')
-                
-                # Extract Experiment Type - use gdsType and ptechType
-                exp_type = self._extract_experiment_type(docsum)
-                
-                 # Extract Publication/PMID - use PubMedIds and Relations
-                publication = self._extract_publication(docsum)
-                
-                # Map platform to readable name
-                platform = map_platform_name(platform_gpl)
-                
-                # Generate download link
-                download_link = ""
-                if accession:
-                    download_link = f"https://www.ncbi.nlm.nih.gov/geo/query/acc.cgi?acc={accession}"
-                
-                studies.append({
-                    "Platform": platform,
-                    "Accession": accession,
-                    "Title": title,
-                    "Public Date": public_date,
-                    "Experiment Type": exp_type,
-                    "Organism": organism,
-                    "Summary (for Tissue)": summary,
-                    "Samples": samples,
-                    "Publication": publication,
-                    "Download Link": download_link,
-                    "Source": "NCBI GEO"
-                })
-                
-            except Exception as e:
+                study = self._parse_docsum(docsum)
+            except Exception:
                 # Skip problematic entries but continue
                 continue
+            
+            yield study
+    
+    def _parse_docsum(self, docsum) -> Dict:
+        """
+        Build a study dictionary from one DocSum element.
         
-        return studies
+        Args:
+            docsum: XML DocSum element
+        
+        Returns:
+            Study dictionary
+        """
+        # One pass over the top-level Items; lookups below are dict hits, not tree scans
+        items = build_item_index(docsum)
+        
+        # Plain text fields, driven by the field table
+        study = {}
+        for column, name, convert in _DOCSUM_TEXT_FIELDS:
+            text = item_text(items, name)
+            study[column] = convert(text) if convert else text
+        
+        # Extract Experiment Type - use gdsType and ptechType
+        study["Experiment Type"] = self._extract_experiment_type(items)
+        
+        # Extract Publication/PMID - use PubMedIds and Relations
+        study["Publication"] = self._extract_publication(items)
+        
+        # Generate download link
+        accession = study["Accession"]
+        study["Download Link"] = (
+            f"https://www.ncbi.nlm.nih.gov/geo/query/acc.cgi?acc={accession}" if accession else ""
+        )
+        study["Source"] = "NCBI GEO"
+        
+        return study
     
-    def _extract_experiment_type(self, docsum) -> str:
+    def _extract_experiment_type(self, items: Dict) -> str:
         """
         Extract experiment type from DocSum with robust parsing.
         
         Args:
-            docsum: XML DocSum element
+            items: Top-level Items by Name, from build_item_index
         
         Returns:
             Experiment type string
@@ -205,24 +406,24 @@ class NCBIFetcher:
         exp_types = []
         
         # Try gdsType (e.g., \"Expression profiling by array\", \"Other\")
-        gds_type = safe_find_text(docsum, 'Name', 'gdsType')
+        gds_type = item_text(items, 'gdsType')
         if gds_type and gds_type != "Other":
             exp_types.append(gds_type)
         
         # Try ptechType (platform technology type)
-        ptech_type = safe_find_text(docsum, 'Name', 'ptechType')
+        ptech_type = item_text(items, 'ptechType')
         if ptech_type:
             exp_types.append(ptech_type)
         
         # Try entryType 
-        entry_type = safe_find_text(docsum, 'Name', 'entryType')
+        entry_type = item_text(items, 'entryType')
         if entry_type and entry_type not in ['GSE', 'GDS']:
             exp_types.append(entry_type)
         
         # Try legacy ExpType field (from older records)
         
         # Try to find ExpType item
-        exp_type_item = docsum.find("./Item[@Name='ExpType']")
+        exp_type_item = items.get('ExpType')
         
         if exp_type_item is not None:
             # Check if it's a LIST container
@@ -244,12 +445,12 @@ class NCBIFetcher:
         
         return "Spatial Transcriptomics"  # Default for ST datasets
     
-    def _extract_publication(self, docsum) -> str:
+    def _extract_publication(self, items: Dict) -> str:
         """
         Extract publication PMID from DocSum with robust parsing.
         
         Args:
-            docsum: XML DocSum element
+            items: Top-level Items by Name, from build_item_index
         
         Returns:
             PMID string
@@ -257,12 +458,12 @@ class NCBIFetcher:
         publication = ""
         
         # First try PubMedIds field (most reliable)
-        pubmed_item = docsum.find("./Item[@Name='PubMedIds']")
+        pubmed_item = items.get('PubMedIds')
         if pubmed_item is not None:
             # This is typically a List
             if pubmed_item.get('Type') == 'List':
                 # Find all inner Int items
-                inner_items = pubmed_item.findall(".Item")
+                inner_items = pubmed_item.findall("./Item")
                 if inner_items:
                     for item in inner_items:
                         if item.text:
@@ -278,9 +479,9 @@ class NCBIFetcher:
         
         # Fallback: try Relations field
         if not publication:
-            relations_item = docsum.find("./Item[@Name='Relations']")
+            relations_item = items.get('Relations')
             if relations_item is not None and relations_item.get('Type') == 'List':
-                all_relations = relations_item.findall(".Item")
+                all_relations = relations_item.findall("./Item")
                 for rel in all_relations:
                     if rel.text and "pubmed" in rel.text.lower():
                         pmid = extract_pmid(rel.text)
@@ -290,9 +491,9 @@ class NCBIFetcher:
         
         # Another fallback: try ExtRelations
         if not publication:
-            ext_rel_item = docsum.find("./Item[@Name='ExtRelations']")
+            ext_rel_item = items.get('ExtRelations')
             if ext_rel_item is not None and ext_rel_item.get('Type') == 'List':
-                all_relations = ext_rel_item.findall(".Item")
+                all_relations = ext_rel_item.findall("./Item")
                 for rel in all_relations:
                     if rel.text:
                         pmid = extract_pmid(rel.text)
@@ -318,4 +519,9 @@ class NCBIFetcher:
         if not id_list:
             return []
         
+        # History-based requests are cached under their ID chunks, so they share
+        # cache entries with fetch_summaries
+        if self.webenv and self.query_key:
+            return self.fetch_summaries_via_history(self.webenv, self.query_key, len(id_list), id_list=id_list)
+        
         return self.fetch_summaries(id_list)
@@ -1,24 +1,118 @@
 """10x Genomics datasets fetcher."""
 
-import requests
-import time
-from typing import List, Dict, Optional
-from bs4 import BeautifulSoup
-import json
+import importlib.util
+import logging
+import threading
+from typing import List, Dict, Iterator, Optional, Tuple
+from bs4 import BeautifulSoup, CData, NavigableString
 import re
 from config import GENERAL_REQUEST_DELAY
+from utils import loads_json, make_session, stable_id
+from cache import ResponseCache
+from tenx_enhanced import comprehensive_10x_datasets, curated_10x_datasets
+
+# Per-URL probe diagnostics; user-facing progress still goes to stdout
+logger = logging.getLogger(__name__)
+
+# lxml's C parser is several times faster than the pure-Python html.parser;
+# BeautifulSoup imports it itself, so only check that it is installed
+_HTML_PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+# Class-name patterns for the HTML dataset listing, compiled once
+_CARD_CLASS_RE = re.compile(r'dataset|card|item', re.I)
+_LIST_ITEM_CLASS_RE = re.compile(r'dataset|result', re.I)
+_TITLE_CLASS_RE = re.compile(r'title|name', re.I)
+_DESCRIPTION_CLASS_RE = re.compile(r'description|summary', re.I)
+_TITLE_TAGS = frozenset({'h1', 'h2', 'h3', 'h4', 'a'})
+_DESCRIPTION_TAGS = frozenset({'p', 'div'})
+
+
+def _has_class(classes, pattern) -> bool:
+    """Whether any CSS class matches pattern (BeautifulSoup class_=regex semantics)."""
+    return any(pattern.search(css_class) for css_class in classes)
+
+
+def _is_dataset_container(tag) -> bool:
+    """
+    Match elements that may hold one dataset: <article>, and <div>/<li> with a dataset-like class.
+    
+    Args:
+        tag: BeautifulSoup tag
+    
+    Returns:
+        True if the tag is a dataset container
+    """
+    if tag.name == 'article':
+        return True
+    
+    if tag.name == 'div':
+        pattern = _CARD_CLASS_RE
+    elif tag.name == 'li':
+        pattern = _LIST_ITEM_CLASS_RE
+    else:
+        return False
+    
+    return _has_class(tag.get('class') or (), pattern)
+
+
+def _scan_container(container) -> Tuple:
+    """
+    Walk a dataset container's descendants once, collecting what the parser needs.
+    
+    Equivalent to separate find() calls for the title, link and description
+    elements plus get_text(), each of which would walk the subtree again.
+    
+    Args:
+        container: BeautifulSoup tag for one dataset card
+    
+    Returns:
+        (title element, first <a href>, description element, full text);
+        the title falls back to the first <a> when no element has a title class
+    """
+    title_elem = first_anchor = link_elem = desc_elem = None
+    texts = []
+    
+    for node in container.descendants:
+        name = node.name
+        if name is None:
+            # Same strings get_text() uses (skips comments, doctypes, etc.)
+            if type(node) in (NavigableString, CData):
+                texts.append(node)
+            continue
+        
+        if name == 'a':
+            if first_anchor is None:
+                first_anchor = node
+            if link_elem is None and node.get('href') is not None:
+                link_elem = node
+        
+        if name in _TITLE_TAGS or name in _DESCRIPTION_TAGS:
+            classes = node.get('class') or ()
+            if title_elem is None and name in _TITLE_TAGS and _has_class(classes, _TITLE_CLASS_RE):
+                title_elem = node
+            if desc_elem is None and name in _DESCRIPTION_TAGS and _has_class(classes, _DESCRIPTION_CLASS_RE):
+                desc_elem = node
+    
+    return title_elem or first_anchor, link_elem, desc_elem, ''.join(texts)
 
 
 class TenXFetcher:
     """Fetches spatial transcriptomics datasets from 10x Genomics."""
     
-    def __init__(self):
-        """Initialize 10x Genomics fetcher."""
+    def __init__(self, cache: Optional[ResponseCache] = None, stop_event: Optional[threading.Event] = None):
+        """
+        Initialize 10x Genomics fetcher.
+        
+        Args:
+            cache: On-disk cache for dataset pages (None disables caching)
+            stop_event: When set, no further pages are requested (e.g. on Ctrl-C)
+        """
+        self.cache = cache
+        self.stop_event = stop_event or threading.Event()
         self.base_url = "https://www.10xgenomics.com"
         self.datasets_api = "https://www.10xgenomics.com/support/spatial-gene-expression-ffpe/documentation/datasets"
         self.request_delay = GENERAL_REQUEST_DELAY
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.session = make_session({
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
         })
     
@@ -29,90 +123,157 @@ class TenXFetcher:
         Returns:
             List of dataset dictionaries
         """
-        print("🔍 Fetching datasets from 10x Genomics...")
+        datasets = list(self.iter_datasets())
+        print(f"✅ Found {len(datasets)} datasets from 10x Genomics")
+        return datasets
+    
+    def iter_datasets(self) -> Iterator[Dict]:
+        """
+        Yield spatial transcriptomics datasets from 10x Genomics one at a time.
         
-        datasets = []
+        Live datasets are streamed as they are parsed; if none can be fetched,
+        the curated list is yielded instead.
+        
+        Yields:
+            Dataset dictionaries
+        """
+        print("🔍 Fetching datasets from 10x Genomics...")
         
+        found = False
         try:
             # Try to fetch live data from 10x Genomics
-            live_datasets = self._fetch_live_datasets()
-            
-            if live_datasets:
-                datasets = live_datasets
-            else:
-                # Fallback to curated list if scraping fails
-                print("   ⚠️  Live fetching failed, using curated list as fallback...")
-                datasets = self._get_curated_10x_datasets()
-            
-            print(f"✅ Found {len(datasets)} datasets from 10x Genomics")
-            
+            for dataset in self._iter_live_datasets():
+                found = True
+                yield dataset
         except Exception as e:
             print(f"⚠️  Error fetching 10x Genomics data: {e}")
+            if found:
+                return
             print("   Using curated list as fallback...")
-            datasets = self._get_curated_10x_datasets()
+        else:
+            if found:
+                return
+            # Fallback to curated list if scraping fails
+            print("   ⚠️  Live fetching failed, using curated list as fallback...")
         
-        return datasets
+        yield from self._get_curated_10x_datasets()
     
-    def _fetch_live_datasets(self) -> List[Dict]:
+    def _iter_live_datasets(self) -> Iterator[Dict]:
         """
-        Fetch live datasets from 10x Genomics website.
+        Yield live datasets from the 10x Genomics website, skipping repeated titles.
         
-        Returns:
-            List of dataset dictionaries
+        Yields:
+            Dataset dictionaries
         """
-        datasets = []
+        # Remove duplicates based on title (first occurrence wins)
+        seen_titles = set()
+        for dataset in self._iter_page_datasets():
+            if dataset['Title'] not in seen_titles:
+                seen_titles.add(dataset['Title'])
+                yield dataset
+    
+    def _iter_page_datasets(self) -> Iterator[Dict]:
+        """
+        Yield datasets from the first 10x dataset page that provides any.
         
+        Yields:
+            Dataset dictionaries
+        """
         # 10x has multiple dataset pages, try different URLs
+        # (structured JSON endpoint first; the HTML listing is scraped only if it fails)
         dataset_pages = [
-            "https://www.10xgenomics.com/datasets?query=&page=1&configure%5BhitsPerPage%5D=500&configure%5BgetRankingInfo%5D=true&refinementList%5Bspecies%5D=&refinementList%5Bproduct.name%5D%5B0%5D=Spatial%20Gene%20Expression",
-            "https://cf.10xgenomics.com/supp/spatial-exp/spatial_datasets.json"  # Possible API endpoint
+            "https://cf.10xgenomics.com/supp/spatial-exp/spatial_datasets.json",  # Possible API endpoint
+            "https://www.10xgenomics.com/datasets?query=&page=1&configure%5BhitsPerPage%5D=500&configure%5BgetRankingInfo%5D=true&refinementList%5Bspecies%5D=&refinementList%5Bproduct.name%5D%5B0%5D=Spatial%20Gene%20Expression"
         ]
         
+        # Pages are fetched one at a time, so the HTML listing is only downloaded
+        # when the JSON endpoint gives nothing
         for url in dataset_pages:
+            if self.stop_event.is_set():
+                return
+            
+            content, fresh = self._fetch_page(url)
+            if content is None:
+                continue
+            
+            found = False
             try:
-                response = self.session.get(url, timeout=30)
-                if response.status_code == 200:
-                    
-                    # Try to parse as JSON first (API endpoint)
-                    if 'json' in url or response.headers.get('content-type', '').startswith('application/json'):
-                        try:
-                            data = response.json()
-                            parsed = self._parse_json_response(data)
-                            if parsed:
-                                datasets.extend(parsed)
-                                continue
-                        except:
-                            pass
-                    
-                    # Parse HTML
-                    soup = BeautifulSoup(response.content, 'html.parser')
-                    parsed = self._parse_html_datasets(soup)
-                    if parsed:
-                        datasets.extend(parsed)
-                        break
-                
-                time.sleep(self.request_delay)
-                
+                for dataset in self._parse_page(url, content):
+                    if not found:
+                        found = True
+                        # Only pages that produced datasets are cached; empty or
+                        # error pages are fetched again next run
+                        if fresh and self.cache:
+                            self.cache.set(url, None, content)
+                    yield dataset
             except Exception as e:
-                print(f"   Failed to fetch from {url[:50]}...: {e}")
-                continue
+                logger.debug("Failed to parse %s...: %s", url[:50], e)
+            
+            if found:
+                break
+    
+    def _parse_page(self, url: str, content: bytes) -> Iterator[Dict]:
+        """
+        Yield datasets from one downloaded page, as JSON if it looks like JSON, else as HTML.
+        
+        Args:
+            url: Page URL
+            content: Page content
         
-        # Remove duplicates based on title
-        if datasets:
-            seen = set()
-            unique_datasets = []
-            for d in datasets:
-                if d['Title'] not in seen:
-                    seen.add(d['Title'])
-                    unique_datasets.append(d)
-            return unique_datasets
+        Yields:
+            Dataset dictionaries
+        """
+        # Try to parse as JSON first (API endpoint, or a body that looks like JSON)
+        if 'json' in url or content.lstrip()[:1] in (b'{', b'['):
+            try:
+                data = loads_json(content)
+            except ValueError:
+                data = None
+            
+            if data is not None:
+                found = False
+                for dataset in self._parse_json_response(data):
+                    found = True
+                    yield dataset
+                
+                if found:
+                    return
         
-        return []
+        # Parse HTML
+        soup = BeautifulSoup(content, _HTML_PARSER)
+        yield from self._parse_html_datasets(soup)
     
-    def _parse_json_response(self, data: dict) -> List[Dict]:
-        """Parse JSON API response."""
-        datasets = []
+    def _fetch_page(self, url: str) -> Tuple[Optional[bytes], bool]:
+        """
+        Download one dataset page, reading through the response cache.
+        
+        Args:
+            url: Page URL
+        
+        Returns:
+            Page content (None if the request failed or did not return 200), and
+            whether it was freshly downloaded and so still needs caching
+        """
+        content = self.cache.get(url) if self.cache else None
+        if content is not None:
+            return content, False
         
+        try:
+            response = self.session.get(url, timeout=30)
+        except Exception as e:
+            # Network failure: fall back to an expired cached copy, if any
+            stale = self.cache.get(url, allow_stale=True) if self.cache else None
+            if stale is None:
+                logger.debug("Failed to fetch from %s...: %s", url[:50], e)
+            return stale, False
+        
+        if response.status_code != 200:
+            return None, False
+        
+        return response.content, True
+    
+    def _parse_json_response(self, data: dict) -> Iterator[Dict]:
+        """Parse JSON API response, yielding one dataset at a time."""
         # Try different possible JSON structures
         items = data.get('datasets', data.get('hits', data.get('results', [])))
         
@@ -136,85 +297,70 @@ class TenXFetcher:
                     "Download Link": item.get('url', item.get('link', '')),
                     "Source": "10x Genomics"
                 }
-                datasets.append(dataset)
-            except:
+            except Exception:
                 continue
-        
-        return datasets
+            
+            yield dataset
     
-    def _parse_html_datasets(self, soup: BeautifulSoup) -> List[Dict]:
-        """Parse HTML page for datasets."""
-        datasets = []
-        
+    def _parse_html_datasets(self, soup: BeautifulSoup) -> Iterator[Dict]:
+        """Parse HTML page for datasets, yielding one dataset at a time."""
         # Look for dataset cards/entries
-        # 10x typically uses divs or cards for datasets
-        potential_containers = [
-            soup.find_all('div', class_=re.compile(r'dataset|card|item', re.I)),
-            soup.find_all('article'),
-            soup.find_all('li', class_=re.compile(r'dataset|result', re.I))
-        ]
-        
-        for containers in potential_containers:
-            for item in containers:
-                try:
-                    # Try to extract title
-                    title_elem = item.find(['h1', 'h2', 'h3', 'h4', 'a'], class_=re.compile(r'title|name', re.I))
-                    if not title_elem:
-                        title_elem = item.find('a')
-                    
-                    if not title_elem:
-                        continue
-                    
-                    title = title_elem.get_text(strip=True)
-                    
-                    # Check if it's spatial-related
-                    item_text = item.get_text().lower()
-                    if 'spatial' not in item_text and 'visium' not in item_text:
-                        continue
-                    
-                    # Extract organism
-                    organism = "Unknown"
-                    if 'human' in item_text:
-                        organism = "Homo sapiens"
-                    elif 'mouse' in item_text:
-                        organism = "Mus musculus"
-                    
-                    # Extract link
-                    link = " "
-                    link_elem = item.find('a', href=True)
-                    if link_elem:
-                        link = link_elem['href']
-                        if not link.startswith('http'):
-                            link = self.base_url + link
-                    
-                    # Extract description
-                    desc_elem = item.find(['p', 'div'], class_=re.compile(r'description|summary', re.I))
-                    description = desc_elem.get_text(strip=True) if desc_elem else " "
-                    
-                    dataset = {
-                        "Platform": "10x Genomics Visium",
-                        "Accession": f"10x-{hash(title) % 100000}",
-                        "Title": title,
-                        "Public Date": " ",
-                        "Experiment Type": "Spatial Gene Expression",
-                        "Organism": organism,
-                        "Summary (for Tissue)": description,
-                        "Samples": "1",
-                        "Publication": " ",
-                        "Download Link": link,
-                        "Source": "10x Genomics"
-                    }
-                    datasets.append(dataset)
-                    
-                except Exception as e:
+        # 10x typically uses divs or cards for datasets; one walk finds all kinds
+        for item in soup.find_all(_is_dataset_container):
+            try:
+                # One pass over the card collects its title, link, description and text
+                title_elem, link_elem, desc_elem, item_text = _scan_container(item)
+                
+                # Try to extract title
+                if not title_elem:
                     continue
-        return datasets
+                
+                title = title_elem.get_text(strip=True)
+                
+                # Check if it's spatial-related
+                item_text = item_text.lower()
+                if 'spatial' not in item_text and 'visium' not in item_text:
+                    continue
+                
+                # Extract organism
+                organism = "Unknown"
+                if 'human' in item_text:
+                    organism = "Homo sapiens"
+                elif 'mouse' in item_text:
+                    organism = "Mus musculus"
+                
+                # Extract link
+                link = " "
+                if link_elem:
+                    link = link_elem['href']
+                    if not link.startswith('http'):
+                        link = self.base_url + link
+                
+                # Extract description
+                description = desc_elem.get_text(strip=True) if desc_elem else " "
+                
+                dataset = {
+                    "Platform": "10x Genomics Visium",
+                    "Accession": f"10x-{stable_id(title)}",
+                    "Title": title,
+                    "Public Date": " ",
+                    "Experiment Type": "Spatial Gene Expression",
+                    "Organism": organism,
+                    "Summary (for Tissue)": description,
+                    "Samples": "1",
+                    "Publication": " ",
+                    "Download Link": link,
+                    "Source": "10x Genomics"
+                }
+                
+            except Exception as e:
+                continue
+            
+            yield dataset
     
     def _get_curated_10x_datasets(self) -> List[Dict]:
         """Use enhanced comprehensive dataset list."""
-        from tenx_enhanced import TenXEnhancedFetcher
-        enhanced = TenXEnhancedFetcher()
-        return enhanced._get_comprehensive_10x_datasets()
+        return [dict(dataset) for dataset in comprehensive_10x_datasets()]
     
     def _get_curated_10x_datasets_old(self) -> List[Dict]:
         """
@@ -223,112 +369,4 @@ class TenXFetcher:
         Returns:
             List of dataset dictionaries
         """
-        # Curated list of well-known 10x Visium datasets
-        datasets = [
-            {
-                "Platform": "10x Genomics Visium",
-                "Accession": "10x-human-brain-1",
-                "Title": "Human Brain Section (Coronal)",
-                "Public Date": "2020",
-                "Experiment Type": "Spatial Gene Expression",
-                "Organism": "Homo sapiens",
-                "Summary (for Tissue)": "Coronal section of the human brain, showing multiple anatomical regions",
-                "Samples": "1",
-                "Publication": "",
-                "Download Link": "https://www.10xgenomics.com/resources/datasets/human-brain-section-coronal-1-standard-1-0-0",
-                "Source": "10x Genomics"
-            },
-            {
-                "Platform": "10x Genomics Visium",
-                "Accession": "10x-human-heart-1",
-                "Title": "Human Heart",
-                "Public Date": "2020",
-                "Experiment Type": "Spatial Gene Expression",
-                "Organism": "Homo sapiens",
-                "Summary (for Tissue)": "Fresh frozen human heart tissue",
-                "Samples": "1",
-                "Publication": "",
-                "Download Link": "https://www.10xgenomics.com/resources/datasets/human-heart-1-standard-1-0-0",
-                "Source": "10x Genomics"
-            },
-            {
-                "Platform": "10x Genomics Visium",
-                "Accession": "10x-human-breast-cancer-1",
-                "Title": "Human Breast Cancer (Block A Section 1)",
-                "Public Date": "2020",
-                "Experiment Type": "Spatial Gene Expression",
-                "Organism": "Homo sapiens",
-                "Summary (for Tissue)": "Invasive ductal carcinoma breast tissue",
-                "Samples": "1",
-                "Publication": "",
-                "Download Link": "https://www.10xgenomics.com/resources/datasets/human-breast-cancer-block-a-section-1-1-standard-1-1-0",
-                "Source": "10x Genomics"
-            },
-            {
-                "Platform": "10x Genomics Visium",
-                "Accession": "10x-mouse-brain-1",
-                "Title": "Mouse Brain Section (Coronal)",
-                "Public Date": "2020",
-                "Experiment Type": "Spatial Gene Expression",
-                "Organism": "Mus musculus",
-                "Summary (for Tissue)": "Coronal section of adult mouse brain",
-                "Samples": "1",
-                "Publication": "",
-                "Download Link": "https://www.10xgenomics.com/resources/datasets/mouse-brain-section-coronal-1-standard-1-0-0",
-                "Source": "10x Genomics"
-            },
-            {
-                "Platform": "10x Genomics Visium",
-                "Accession": "10x-mouse-kidney-1",
-                "Title": "Mouse Kidney Section",
-                "Public Date": "2020",
-                "Experiment Type": "Spatial Gene Expression",
-                "Organism": "Mus musculus",
-                "Summary (for Tissue)": "Fresh frozen adult mouse kidney tissue",
-                "Samples": "1",
-                "Publication": "",
-                "Download Link": "https://www.10xgenomics.com/resources/datasets/mouse-kidney-section-coronal-1-standard-1-1-0",
-                "Source": "10x Genomics"
-            },
-            {
-                "Platform": "10x Genomics Visium",
-                "Accession": "10x-human-prostate-cancer",
-                "Title": "Human Prostate Cancer with Invasive Carcinoma",
-                "Public Date": "2021",
-                "Experiment Type": "Spatial Gene Expression",
-                "Organism": "Homo sapiens",
-                "Summary (for Tissue)": "FFPE human prostate cancer tissue with invasive carcinoma",
-                "Samples": "1",
-                "Publication": "",
-                "Download Link": "https://www.10xgenomics.com/resources/datasets/human-prostate-cancer-with-invasive-carcinoma-ffpe-1-standard",
-                "Source": "10x Genomics"
-            },
-            {
-                "Platform": "10x Genomics Visium",
-                "Accession": "10x-human-colorectal-cancer",
-                "Title": "Human Colorectal Cancer",
-                "Public Date": "2021",
-                "Experiment Type": "Spatial Gene Expression",
-                "Organism": "Homo sapiens",
-                "Summary (for Tissue)": "FFPE human colorectal cancer tissue",
-                "Samples": "1",
-                "Publication": "",
-                "Download Link": "https://www.10xgenomics.com/resources/datasets/human-colorectal-cancer-ffpe-1-standard",
-                "Source": "10x Genomics"
-            },
-            {
-                "Platform": "10x Genomics Visium",
-                "Accession": "10x-human-lymph-node",
-                "Title": "Human Lymph Node",
-                "Public Date": "2020",
-                "Experiment Type": "Spatial Gene Expression",
-                "Organism": "Homo sapiens",
-                "Summary (for Tissue)": "Fresh frozen human lymph node tissue",
-                "Samples": "1",
-                "Publication": "",
-                "Download Link": "https://www.10xgenomics.com/resources/datasets/human-lymph-node-1-standard-1-1-0",
-                "Source": "10x Genomics"
-            },
-        ]
-        
-        return datasets
+        return [dict(dataset) for dataset in curated_10x_datasets("legacy")]
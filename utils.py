@@ -1,10 +1,76 @@
 """Utility functions for ST data miner."""
 
-import xml.etree.ElementTree as ET
-from typing import Optional, List
+import functools
+import hashlib
+import importlib.util
+import json
+from operator import itemgetter
+from typing import Optional, List, Dict, Iterator
 import re
+import sys
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from config import HUMAN_ORGANISMS, PLATFORM_MAPPINGS
 
+# orjson parses JSON several times faster; fall back to the stdlib parser
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Prefer lxml (libxml2, compiled XPath); fall back to the stdlib
+try:
+    from lxml import etree as ET
+    _HAS_LXML = True
+    # huge_tree lifts libxml2's size limits; malformed input still raises, as with the stdlib
+    _ITERPARSE_OPTIONS = {'huge_tree': True}
+except ImportError:
+    import xml.etree.ElementTree as ET
+    _HAS_LXML = False
+    _ITERPARSE_OPTIONS = {}
+
+# Compiled lxml XPath per attribute name, so safe_find_text skips re-parsing the path
+_XPATH_CACHE: Dict[str, object] = {}
+
+# Patterns used on every record, compiled once
+_NON_DIGIT_RE = re.compile(r'[^0-9]')
+# str.translate table deleting every ASCII character except 0-9
+_ASCII_NON_DIGITS = str.maketrans('', '', ''.join(chr(c) for c in range(128) if not '0' <= chr(c) <= '9'))
+_PMID_RE = re.compile(r'\b(\d{7,9})\b')  # bare PMIDs are typically 7-9 digits
+_ACCESSION_RE = re.compile(r'^G(SE|SM|PL|DS)\d+$')  # GSE, GSM, GPL, GDS
+
+# Interned, so every record mapped to a platform shares one name object
+_PLATFORM_NAMES = {gpl_id: sys.intern(name) for gpl_id, name in PLATFORM_MAPPINGS.items()}
+
+# Matches any mapped GPL ID inside a string; most unmapped IDs are ruled out in one scan
+_PLATFORM_KEY_RE = re.compile('|'.join(re.escape(gpl_id) for gpl_id in _PLATFORM_NAMES))
+
+# Case-insensitive substring match of any human organism name, in one search;
+# shared with the exporter's Organism column filter
+HUMAN_ORGANISM_RE = re.compile('|'.join(re.escape(h) for h in sorted(HUMAN_ORGANISMS)), re.IGNORECASE)
+
+# urllib3 can only decode Brotli responses when a Brotli package is installed
+# (it imports the package itself, so only check that it is there)
+_ACCEPT_ENCODING = 'gzip, deflate, br' if importlib.util.find_spec('brotli') else 'gzip, deflate'
+
+
+def _item_xpath(name_attr: str):
+    """
+    Compiled lxml XPath matching Items by one attribute, cached per attribute.
+    
+    Args:
+        name_attr: Attribute name (e.g., 'Name')
+    
+    Returns:
+        XPath object taking the attribute value as $name_val
+    """
+    xpath = _XPATH_CACHE.get(name_attr)
+    if xpath is None:
+        xpath = ET.XPath(f".//Item[@{name_attr}=$name_val]")
+        _XPATH_CACHE[name_attr] = xpath
+    return xpath
+
 
 def safe_find_text(element, name_attr: str, name_val: str) -> str:
     """
@@ -19,13 +85,85 @@ def safe_find_text(element, name_attr: str, name_val: str) -> str:
     Returns:
         Text content or empty string
     """
-    try:
-        item = element.find(f".//Item[@{name_attr}='{name_val}']")
-        if item is not None and item.text:
-            return item.text.strip()
-        return ""
-    except AttributeError:
+    if element is None:
         return ""
+    
+    if _HAS_LXML and isinstance(element, ET._Element):
+        matches = _item_xpath(name_attr)(element, name_val=name_val)
+        text = matches[0].text if matches else None
+    else:
+        text = element.findtext(f".//Item[@{name_attr}='{name_val}']")
+    return text.strip() if text else ""
+
+
+def build_item_index(element, name_attr: str = 'Name') -> Dict:
+    """
+    Index the Item children of an element by attribute in a single pass.
+    
+    Use this instead of repeated safe_find_text calls when several fields
+    are read from the same record.
+    
+    Args:
+        element: XML element whose direct Item children are indexed
+        name_attr: Attribute name (e.g., 'Name')
+    
+    Returns:
+        Dict of attribute value -> Item element (first occurrence wins, like find())
+    """
+    index = {}
+    for item in element:
+        name_val = item.get(name_attr)
+        if name_val:
+            index.setdefault(name_val, item)
+    return index
+
+
+def item_text(index: Dict, name_val: str) -> str:
+    """
+    Stripped text of an indexed Item.
+    
+    Args:
+        index: Items by attribute value, from build_item_index
+        name_val: Attribute value to look up
+    
+    Returns:
+        Text content or empty string
+    """
+    item = index.get(name_val)
+    if item is not None and item.text:
+        return item.text.strip()
+    return ""
+
+
+def iter_records(source, tag: str = 'DocSum') -> Iterator:
+    """
+    Stream the record elements of an XML document without building the whole tree.
+    
+    Each record is cleared once the caller moves on to the next one, so memory
+    stays proportional to one record rather than the document.
+    
+    Args:
+        source: File path or binary file object
+        tag: Tag of the record elements
+    
+    Yields:
+        Record elements, fully parsed
+    
+    Raises:
+        ET.ParseError: If the document is malformed
+    """
+    options = dict(_ITERPARSE_OPTIONS, tag=tag) if _HAS_LXML else {}
+    for _, elem in ET.iterparse(source, events=('end',), **options):
+        if elem.tag != tag:
+            continue
+        
+        yield elem
+        
+        # Release the finished record (and, with lxml, its already-processed siblings)
+        elem.clear()
+        if _HAS_LXML:
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
 
 
 def extract_pmid(text: str) -> str:
@@ -41,24 +179,25 @@ def extract_pmid(text: str) -> str:
     if not text:
         return ""
     
-    # Try to find PMID: pattern
-    if "PMID:" in text:
-        try:
-            pmid = text.split("PMID:")[1].split()[0].strip()
-            # Remove any non-numeric characters
-            pmid = re.sub(r'[^0-9]', '', pmid)
-            return pmid if pmid else ""
-        except (IndexError, AttributeError):
-            pass
+    # Try to find PMID: pattern; the token after it ends at whitespace or the next "PMID:"
+    start = text.find("PMID:")
+    if start >= 0:
+        end = text.find("PMID:", start + 5)
+        tokens = text[start + 5:end if end >= 0 else None].split(None, 1)
+        if tokens:
+            # Remove any non-numeric characters; translate covers the usual ASCII token
+            pmid = tokens[0]
+            return pmid.translate(_ASCII_NON_DIGITS) if pmid.isascii() else _NON_DIGIT_RE.sub('', pmid)
     
     # Try to find just numbers that look like PMIDs (typically 8 digits)
-    pmid_match = re.search(r'\b(\d{7,9})\b', text)
+    pmid_match = _PMID_RE.search(text)
     if pmid_match:
         return pmid_match.group(1)
     
     return ""
 
 
+@functools.lru_cache(maxsize=1024)
 def is_human_organism(organism: str) -> bool:
     """
     Check if organism is human.
@@ -72,10 +211,41 @@ def is_human_organism(organism: str) -> bool:
     if not organism:
         return False
     
-    organism_lower = organism.lower().strip()
-    return any(human.lower() in organism_lower for human in HUMAN_ORGANISMS)
+    return HUMAN_ORGANISM_RE.search(organism) is not None
 
 
+def _lookup_platform(platform_id: str) -> Optional[str]:
+    """
+    Look up a single platform ID in PLATFORM_MAPPINGS.
+    
+    Args:
+        platform_id: GPL platform ID
+    
+    Returns:
+        Readable platform name, or None if unmapped
+    """
+    # Canonical GPL IDs hit the dict directly; only malformed IDs need the scan
+    name = _PLATFORM_NAMES.get(platform_id)
+    if name is None and _PLATFORM_KEY_RE.search(platform_id):
+        # Several keys may match; the first in mapping order wins
+        name = next((name for gpl_id, name in _PLATFORM_NAMES.items() if gpl_id in platform_id), None)
+    return name
+
+
+def _unmapped_platform_name(platform_id: str) -> str:
+    """
+    Display name for a platform missing from PLATFORM_MAPPINGS.
+    
+    Args:
+        platform_id: GPL platform ID
+    
+    Returns:
+        "NCBI GEO (<id>)", interned
+    """
+    return sys.intern(f"NCBI GEO ({platform_id})")
+
+
+@functools.lru_cache(maxsize=4096)
 def map_platform_name(platform_id: str) -> str:
     """
     Map platform GPL ID to readable name.
@@ -96,36 +266,30 @@ def map_platform_name(platform_id: str) -> str:
     
     # Handle multiple platforms (semicolon-separated)
     if ";" in platform_id:
-        platforms = [p.strip() for p in platform_id.split(";")]
         mapped_platforms = []
-        for p in platforms:
+        for p in platform_id.split(";"):
+            # strip() hands back the same object when there is nothing to trim
+            p = p.strip()
             if p.isdigit():
                 p = f"GPL{p}"
-            # Check mappings
-            mapped = None
-            for gpl_id, name in PLATFORM_MAPPINGS.items():
-                if gpl_id == p or gpl_id in p:
-                    mapped = name
-                    break
-            if mapped:
-                mapped_platforms.append(mapped)
-            else:
-                mapped_platforms.append(f"NCBI GEO ({p})")
+            mapped = _lookup_platform(p)
+            mapped_platforms.append(mapped or _unmapped_platform_name(p))
         
-        # Return unique platforms
-        return "; ".join(list(dict.fromkeys(mapped_platforms)))
+        # Return unique platforms, in first-seen order
+        seen = set()
+        return sys.intern("; ".join(p for p in mapped_platforms if not (p in seen or seen.add(p))))
 
-    # Check if it's in our mappings
-    for gpl_id, name in PLATFORM_MAPPINGS.items():
-        if gpl_id == platform_id or gpl_id in platform_id:
-            return name
+    # Check if it's in our mappings; names are interned so equal values share one object
+    mapped = _lookup_platform(platform_id)
+    if mapped:
+        return mapped
     
     # If it's a GPL ID, return as is with NCBI prefix
     if platform_id.startswith("GPL"):
-        return f"NCBI GEO ({platform_id})"
+        return _unmapped_platform_name(platform_id)
     
     # Default
-    return f"NCBI GEO (GPL{platform_id})"
+    return _unmapped_platform_name(f"GPL{platform_id}")
 
 
 def clean_text(text: str) -> str:
@@ -141,11 +305,11 @@ def clean_text(text: str) -> str:
     if not text:
         return ""
     
-    # Remove extra whitespace
-    text = re.sub(r'\s+', ' ', text)
-    return text.strip()
+    # Collapse whitespace runs and trim; split() with no separator does both in C
+    return ' '.join(text.split())
 
 
+@functools.lru_cache(maxsize=1024)
 def validate_accession(accession: str) -> bool:
     """
     Validate GEO accession format.
@@ -160,5 +324,84 @@ def validate_accession(accession: str) -> bool:
         return False
     
     # GEO accessions typically start with GSE, GSM, GPL, etc.
-    pattern = r'^G(SE|SM|PL|DS)\d+$'
-    return bool(re.match(pattern, accession))
+    return bool(_ACCESSION_RE.match(accession))
+
+
+def dedupe_datasets(datasets: List[Dict], key: str = 'Title') -> List[Dict]:
+    """
+    Remove datasets whose key field repeats an earlier dataset's.
+    
+    Args:
+        datasets: List of dataset dictionaries
+        key: Field that identifies a dataset
+    
+    Returns:
+        Datasets in original order, first occurrence of each key kept
+    """
+    keys = list(map(itemgetter(key), datasets))
+    
+    # Usual case: no repeats, so one C-level set build replaces the per-item loop
+    if len(set(keys)) == len(keys):
+        return list(datasets)
+    
+    unique = {}
+    for dataset_key, dataset in zip(keys, datasets):
+        unique.setdefault(dataset_key, dataset)
+    return list(unique.values())
+
+
+def stable_id(value) -> str:
+    """
+    Short content hash that is the same across runs (unlike built-in hash()).
+    
+    Args:
+        value: String, or JSON-serializable data (dict keys are sorted first)
+    
+    Returns:
+        12-character hex digest
+    """
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True, default=str)
+    return hashlib.blake2b(value.encode("utf-8"), digest_size=6).hexdigest()
+
+
+def loads_json(content):
+    """
+    Parse a JSON document, using orjson when it is installed.
+    
+    Args:
+        content: JSON text as bytes or str
+    
+    Returns:
+        Parsed object (raises ValueError on invalid JSON)
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def make_session(headers: Optional[Dict] = None, pool_maxsize: int = 10) -> requests.Session:
+    """
+    Create an HTTP session with pooled keep-alive connections and retries.
+    
+    Args:
+        headers: Extra default headers (e.g. User-Agent)
+        pool_maxsize: Connections kept open per host
+    
+    Returns:
+        Configured requests session
+    """
+    session = requests.Session()
+    session.headers.update({
+        'Accept-Encoding': _ACCEPT_ENCODING,
+        'Connection': 'keep-alive'
+    })
+    if headers:
+        session.headers.update(headers)
+    
+    # Retry/backoff on rate-limit and server errors
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, max_retries=retries)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session